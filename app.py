@@ -11,23 +11,41 @@ Fecha: 2025-01-02
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 from collections import Counter
 import tempfile
-import os
+import shutil
+import hashlib
 from pathlib import Path
+from typing import Optional
 import sys
 import logging
 
+from streamlit.runtime.uploaded_file_manager import UploadedFile
+
 logger = logging.getLogger(__name__)
 
-# Agregar el directorio scripts al path para importar módulos
-sys.path.append(str(Path(__file__).parent.parent))
+@st.cache_resource(show_spinner=False)
+def _bootstrap():
+    """Importar el analizador y preparar el directorio de resultados una sola vez por proceso."""
+    # Agregar el directorio scripts al path para importar módulos (sin duplicar entradas)
+    scripts_dir = str(Path(__file__).parent.parent)
+    if scripts_dir not in sys.path:
+        sys.path.append(scripts_dir)
 
-try:
     from categoria_analysis import ExcelCategoryAnalyzer
+
+    # Crear directorio results si no existe
+    results_dir = Path(__file__).parent.parent / "results"
+    results_dir.mkdir(exist_ok=True)
+
+    return ExcelCategoryAnalyzer, results_dir
+
+try:
+    ExcelCategoryAnalyzer, RESULTS_DIR = _bootstrap()
 except ImportError:
     st.error("Error: No se pudo importar el módulo de análisis. Verifica la estructura del proyecto.")
     st.stop()
@@ -45,14 +63,19 @@ st.title("📊 Análisis de Categorías de Llamadas")
 st.markdown("---")
 
 # Función para crear gráficos de categorías
-def crear_grafico_categorias(category_counter, title="Top Categorías"):
-    """Crear gráfico de barras para categorías."""
-    if not category_counter:
+@st.cache_data(show_spinner=False, max_entries=16)
+def crear_grafico_categorias(category_items, title="Top Categorías"):
+    """Crear gráfico de barras para categorías.
+
+    Recibe una tupla ``(categoría, frecuencia)`` ya ordenada (p. ej. las primeras filas del ranking)
+    para que Streamlit pueda cachear la figura entre reruns.
+    """
+    if not category_items:
         return None
 
-    # Convertir counter a DataFrame
+    # Convertir items a DataFrame
     df_categories = pd.DataFrame(
-        category_counter.most_common(20),  # Top 20
+        list(category_items),
         columns=['Categoría', 'Frecuencia']
     )
 
@@ -76,45 +99,39 @@ def crear_grafico_categorias(category_counter, title="Top Categorías"):
     return fig
 
 # Función para crear gráfico de distribución
-def crear_grafico_distribucion(counter, total_rows):
-    """Crear gráfico de distribución de categorías por volumen."""
-    if not counter:
+@st.cache_data(show_spinner=False, max_entries=16)
+def crear_grafico_distribucion(category_items, total_rows):
+    """Crear gráfico de distribución de categorías por volumen.
+
+    Recibe una tupla ``(categoría, frecuencia)`` con todas las categorías.
+    """
+    if not category_items:
         return None
 
-    # Crear datos de distribución
-    high_volume = []
-    medium_volume = []
-    low_volume = []
+    # Clasificar todas las categorías en una sola pasada vectorizada
+    # (0 = alto volumen >=10%, 1 = medio 1-10%, 2 = bajo <1%)
+    counts = np.fromiter((count for _, count in category_items), dtype=np.int64, count=len(category_items))
+    percentages = ExcelCategoryAnalyzer.percent_of_total(counts, total_rows)
+    buckets = np.where(percentages >= 10, 0, np.where(percentages >= 1, 1, 2))
 
-    for category, count in counter.items():
-        percentage = (count / total_rows * 100) if total_rows > 0 else 0
-        if percentage >= 10:
-            high_volume.append((category, count, percentage))
-        elif percentage >= 1:
-            medium_volume.append((category, count, percentage))
-        else:
-            low_volume.append((category, count, percentage))
+    categories_by_bucket = np.bincount(buckets, minlength=3)
+    calls_by_bucket = np.bincount(buckets, weights=counts, minlength=3)
+    share_by_bucket = ExcelCategoryAnalyzer.percent_of_total(calls_by_bucket, total_rows)
 
     # Crear datos para el gráfico
     segments = ['Alto Volumen (>10%)', 'Medio Volumen (1-10%)', 'Bajo Volumen (<1%)']
-    counts = [len(high_volume), len(medium_volume), len(low_volume)]
-    total_calls = [sum(count for _, count, _ in high_volume),
-                   sum(count for _, count, _ in medium_volume),
-                   sum(count for _, count, _ in low_volume)]
 
     fig = go.Figure(data=[
         go.Bar(
             x=segments,
-            y=counts,
+            y=categories_by_bucket.tolist(),
             name='Número de Categorías',
             marker_color='lightblue',
             yaxis='y1'
         ),
-        go.Scatter(
+        go.Scattergl(
             x=segments,
-            y=[sum(count for _, count, _ in high_volume) / total_rows * 100 if total_rows > 0 else 0,
-               sum(count for _, count, _ in medium_volume) / total_rows * 100 if total_rows > 0 else 0,
-               sum(count for _, count, _ in low_volume) / total_rows * 100 if total_rows > 0 else 0],
+            y=share_by_bucket.tolist(),
             name='% del Total',
             mode='lines+markers',
             marker_color='darkblue',
@@ -128,11 +145,294 @@ def crear_grafico_distribucion(counter, total_rows):
         yaxis=dict(title='Número de Categorías', side='left'),
         yaxis2=dict(title='% del Total de Llamadas', side='right', overlaying='y'),
         legend=dict(x=0.5, y=1.1, xanchor='center'),
-        height=400
+        height=400,
+        uirevision='static'
+    )
+
+    return fig
+
+# Función para crear gráfico de subcategorías
+@st.cache_data(show_spinner=False, max_entries=16)
+def crear_grafico_subcategorias(subcategory_rows, title="Top 15 Subcategorías Más Frecuentes"):
+    """Crear gráfico de barras de las principales subcategorías.
+
+    Recibe una tupla de filas ``(subcategoría, frecuencia)``.
+    """
+    if not subcategory_rows:
+        return None
+
+    top_subcats = pd.DataFrame(list(subcategory_rows), columns=['Subcategoría', 'Frecuencia'])
+
+    fig = px.bar(
+        top_subcats,
+        y='Subcategoría',
+        x='Frecuencia',
+        orientation='h',
+        title=title,
+        labels={'Frecuencia': 'Número de Llamadas', 'Subcategoría': 'Subcategoría'},
+        color='Frecuencia',
+        color_continuous_scale='Viridis',
+        text='Frecuencia'
+    )
+    fig.update_layout(
+        height=500,
+        yaxis={'categoryorder': 'total ascending'},
+        showlegend=False
+    )
+    fig.update_traces(texttemplate='%{text}', textposition='outside')
+
+    return fig
+
+# Función para crear gráfico de rutas completas
+@st.cache_data(show_spinner=False, max_entries=16)
+def crear_grafico_rutas(route_rows, title="Top 15 Rutas Completas Más Frecuentes"):
+    """Crear gráfico de barras de las rutas completas más frecuentes.
+
+    Recibe una tupla de filas ``(ruta_completa, frecuencia)``; la cola puede venir agregada como "Otros".
+    """
+    if not route_rows:
+        return None
+
+    route_counts = pd.DataFrame(list(route_rows), columns=['ruta_completa', 'Frecuencia'])
+
+    fig = px.bar(
+        route_counts,
+        y='ruta_completa',
+        x='Frecuencia',
+        orientation='h',
+        title=title,
+        labels={'Frecuencia': 'Número de Llamadas', 'ruta_completa': 'Ruta Completa'},
+        color='Frecuencia',
+        color_continuous_scale='Blues',
+        text='Frecuencia'
+    )
+    fig.update_layout(
+        height=600,
+        yaxis={'categoryorder': 'total ascending'},
+        showlegend=False
+    )
+    fig.update_traces(texttemplate='%{text}', textposition='outside')
+
+    return fig
+
+# Función para crear gráfico de agentes instaladores
+@st.cache_data(show_spinner=False, max_entries=16)
+def crear_grafico_agentes(agent_totals, title="Top 15 Agentes Instaladores por Llamadas"):
+    """Crear gráfico de barras con los agentes instaladores de mayor volumen.
+
+    Recibe una tupla de filas ``(agente_instalador, frecuencia)`` ya ordenada y recortada;
+    la cola puede venir agregada como "Otros".
+    """
+    if not agent_totals:
+        return None
+
+    installers_grouped = pd.DataFrame(list(agent_totals), columns=['agente_instalador', 'Frecuencia'])
+
+    fig = px.bar(
+        installers_grouped,
+        x='agente_instalador',
+        y='Frecuencia',
+        title=title,
+        labels={'Frecuencia': 'Total de Llamadas', 'agente_instalador': 'Agente Instalador'},
+        color='Frecuencia',
+        color_continuous_scale='Oranges',
+        text='Frecuencia'
     )
+    fig.update_layout(
+        height=500,
+        xaxis={'categoryorder': 'total descending'},
+        showlegend=False
+    )
+    fig.update_traces(texttemplate='%{text}', textposition='outside')
+    fig.update_xaxes(tickangle=-45)
+
+    return fig
+
+# Función para crear gráfico de categorías por agente
+@st.cache_data(show_spinner=False, max_entries=16)
+def crear_grafico_agentes_categorias(pivot_top):
+    """Crear gráfico apilado de categorías para los 10 agentes con más llamadas.
+
+    Recibe la tabla dinámica agente × categoría general ya limitada a los agentes a mostrar.
+    """
+    if pivot_top is None or pivot_top.empty:
+        return None
+
+    # Limitar el número de trazas: top 8 categorías y el resto agrupado como "Otros"
+    top_cats = pivot_top.sum(axis=0).nlargest(8).index
+    otros = pivot_top.drop(columns=top_cats).sum(axis=1)
+
+    fig = go.Figure()
+    traces = {categoria: pivot_top[categoria] for categoria in top_cats}
+    if (otros > 0).any():
+        # Si ya hay una categoría real "Otros" entre las principales, el resto se suma a ella
+        traces['Otros'] = traces['Otros'] + otros if 'Otros' in traces else otros
+    for categoria, values in traces.items():
+        values = values[values > 0]
+        fig.add_trace(go.Bar(
+            x=values.index,
+            y=values.to_numpy(),
+            name=categoria
+        ))
+
+    fig.update_layout(
+        barmode='stack',
+        title='Distribución de Categorías por Top 10 Agentes',
+        xaxis_title='Agente',
+        yaxis_title='Número de Llamadas',
+        legend_title_text='Categoría',
+        height=500,
+        uirevision='static'
+    )
+    fig.update_xaxes(tickangle=-45)
 
     return fig
 
+# Función para recortar series al top-K agregando el resto
+def topk_with_tail(series, k, tail_label='Otros'):
+    """Quedarse con los ``k`` valores mayores y sumar el resto en una única entrada ``tail_label``.
+
+    Si entre los ``k`` mayores ya hay una entrada real con esa etiqueta, la cola se suma a
+    ella en lugar de añadir una segunda barra con el mismo nombre.
+    """
+    top = series.nlargest(k)
+    tail = series.drop(top.index).sum()
+    if tail <= 0:
+        return top
+    if tail_label in top.index:
+        top = top.copy()
+        top[tail_label] += tail
+        return top
+    return pd.concat([top, pd.Series({tail_label: tail})])
+
+# Función para agrupar las rutas completas de motivos
+def agrupar_rutas(combined_detail, total_rows):
+    """Contar cada ruta completa con la misma agrupación que la sección de rutas del reporte Excel."""
+    routes = ExcelCategoryAnalyzer.group_routes(combined_detail)
+    routes['% del Total'] = ExcelCategoryAnalyzer.percent_of_total(routes['Frecuencia'], total_rows)
+
+    return routes[['ruta_completa', 'Frecuencia', '% del Total', 'categoria_general', 'categoria_especifica', 'subtipo']]
+
+# Función para materializar las tablas de visualización una sola vez por análisis
+def pivotar_agentes(installers_df):
+    """Agregar las llamadas por agente × categoría general en una sola pasada.
+
+    Las filas quedan ordenadas por el total del agente de mayor a menor, de modo
+    que los gráficos solo tienen que recortar las primeras filas.
+    """
+    pivot = installers_df.pivot_table(
+        index='agente_instalador',
+        columns='categoria_general',
+        values='Frecuencia',
+        aggfunc='sum',
+        fill_value=0,
+        observed=True
+    )
+    totals = pivot.sum(axis=1)
+    return pivot.loc[totals.nlargest(len(totals)).index]
+
+def rankear_categorias(total_counter):
+    """Ordenar las categorías por frecuencia una sola vez, igual que el reporte Excel.
+
+    Devuelve ``ExcelCategoryAnalyzer.rank_counts``: (categorías, frecuencias); los empates
+    conservan el orden de inserción, igual que ``Counter.most_common()``.
+    """
+    return ExcelCategoryAnalyzer.rank_counts(total_counter)
+
+def construir_tablas(analyzer, total_counter, total_rows, detailed_analysis):
+    """Construir los DataFrames que consumen las pestañas a partir del análisis detallado.
+
+    Se calculan una vez al ejecutar el análisis y se guardan en ``st.session_state``,
+    de modo que los reruns (cambio de pestaña, widgets) no vuelven a construirlos.
+    """
+    detailed_analysis = detailed_analysis or {}
+
+    combined_detail = detailed_analysis.get('categoria_combinada_detalle')
+    routes_df = agrupar_rutas(combined_detail, total_rows) if combined_detail else None
+
+    installer_detail = detailed_analysis.get('agente_instalador_detalle')
+    installers_df = None
+    installers_pivot = None
+    if installer_detail:
+        installers_df = ExcelCategoryAnalyzer.detail_frame(installer_detail)
+        # Se mantiene numérico; el formato con % lo aplica column_config al mostrarlo
+        installers_df['% del Agente'] = installers_df['Porcentaje_Agente']
+        installers_pivot = pivotar_agentes(installers_df)
+
+    return {
+        'ranked': rankear_categorias(total_counter),
+        'routes_df': routes_df,
+        'installers_df': installers_df,
+        'installers_pivot': installers_pivot,
+        'subcategory_df': analyzer.generate_subcategory_analysis(detailed_analysis, total_rows)
+    }
+
+# Tamaño máximo de archivo que se analiza directamente desde el buffer subido;
+# los archivos mayores se vuelcan a disco por bloques antes de leerlos
+UPLOAD_IN_MEMORY_MAX_BYTES = 32 * 1024 * 1024
+UPLOAD_COPY_CHUNK_BYTES = 1 << 20
+
+def _hash_uploaded_file(uploaded_file: UploadedFile) -> bytes:
+    """Huella blake2b (nombre y contenido) de un archivo subido, sin copiar sus bytes."""
+    digest = hashlib.blake2b(uploaded_file.name.encode('utf-8'), digest_size=16)
+    with uploaded_file.getbuffer() as buffer:
+        digest.update(buffer)
+    return digest.digest()
+
+# Función cacheada para ejecutar el análisis completo
+@st.cache_data(show_spinner=False, max_entries=8, hash_funcs={UploadedFile: _hash_uploaded_file})
+def _run_analysis(
+    uploaded_files: list,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    results_dir: str
+) -> dict:
+    """Ejecutar el análisis sobre los archivos subidos y cachear el resultado.
+
+    Cada archivo subido se incluye en la clave de caché mediante ``_hash_uploaded_file``
+    (nombre y hash blake2b del contenido) junto con el rango de fechas, de modo que volver
+    a analizar los mismos archivos no vuelve a leer ni procesar los Excel.
+    """
+    # Sin caché Parquet: los archivos grandes se leen desde un directorio temporal distinto en
+    # cada ejecución, así que sus entradas nunca se reutilizarían ni se limpiarían (el resultado
+    # ya queda cacheado por ``st.cache_data``)
+    analyzer = ExcelCategoryAnalyzer(
+        results_dir=results_dir,
+        start_date=start_date,
+        end_date=end_date,
+        use_cache=False
+    )
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        sources = []
+        for index, uploaded_file in enumerate(uploaded_files):
+            uploaded_file.seek(0)
+            if uploaded_file.size <= UPLOAD_IN_MEMORY_MAX_BYTES:
+                # Archivos pequeños: leer directamente del buffer subido, sin copiarlo
+                sources.append((uploaded_file.name, uploaded_file))
+            else:
+                # Archivos grandes: copiar a disco por bloques sin materializar todo el contenido
+                tmp_path = Path(tmp_dir) / f"{index}{Path(uploaded_file.name).suffix}"
+                with open(tmp_path, 'wb') as tmp_file:
+                    shutil.copyfileobj(uploaded_file, tmp_file, UPLOAD_COPY_CHUNK_BYTES)
+                sources.append((uploaded_file.name, tmp_path))
+
+        total_counter, total_rows, detailed_analysis = analyzer.analyze_multiple_files(sources)
+
+    excel_data = None
+    if total_counter:
+        excel_data = analyzer.generate_excel_report(
+            total_counter, total_rows, len(uploaded_files), detailed_analysis
+        )
+
+    return {
+        'total_counter': total_counter,
+        'total_rows': total_rows,
+        'detailed_analysis': detailed_analysis,
+        'excel_data': excel_data,
+        **construir_tablas(analyzer, total_counter, total_rows, detailed_analysis)
+    }
+
 # Función principal
 def main():
     st.sidebar.header("⚙️ Configuración")
@@ -177,6 +477,16 @@ def main():
                 start_date = datetime.combine(start_date_input, datetime.min.time())
                 end_date = datetime.combine(end_date_input, datetime.max.time())
 
+    # Configuración de visualización
+    st.sidebar.subheader("📊 Visualización")
+    top_k = st.sidebar.slider(
+        "Top K",
+        min_value=5,
+        max_value=50,
+        value=15,
+        help="Número de elementos que se muestran en los gráficos de rutas y agentes; el resto se agrupa como \"Otros\""
+    )
+
     # Inicializar estado para resultados del análisis y configuraciones
     if 'analysis_results' not in st.session_state:
         st.session_state.analysis_results = None
@@ -189,42 +499,12 @@ def main():
 
             with st.spinner("🔄 Procesando archivos..."):
                 try:
-                    # Crear analizador con filtros de fecha
-                    # Crear directorio results si no existe
-                    results_dir = Path(__file__).parent.parent / "results"
-                    results_dir.mkdir(exist_ok=True)
-
-                    analyzer = ExcelCategoryAnalyzer(
-                        results_dir=str(results_dir),  # Usar directorio results
-                        start_date=start_date,
-                        end_date=end_date
-                    )
-
-                    # Procesar archivos subidos
-                    temp_files = []
-
-                    try:
-                        for uploaded_file in uploaded_files:
-                            # Guardar archivo temporalmente
-                            with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
-                                tmp_file.write(uploaded_file.getvalue())
-                                temp_files.append(Path(tmp_file.name))
-
-                        # Ejecutar análisis
-                        total_counter, total_rows, detailed_analysis = analyzer.analyze_multiple_files(temp_files)
-
-                        # Limpiar archivos temporales
-                        for temp_file in temp_files:
-                            os.unlink(temp_file)
-
-                    except Exception as e:
-                        # Limpiar archivos temporales en caso de error
-                        for temp_file in temp_files:
-                            try:
-                                os.unlink(temp_file)
-                            except:
-                                pass
-                        raise e
+                    # Ejecutar análisis (cacheado por contenido de archivos y fechas)
+                    results = _run_analysis(uploaded_files, start_date, end_date, str(RESULTS_DIR))
+
+                    total_counter = results['total_counter']
+                    total_rows = results['total_rows']
+                    detailed_analysis = results['detailed_analysis']
 
                     if not total_counter:
                         st.error("❌ No se pudieron extraer categorías de los archivos subidos.")
@@ -237,8 +517,12 @@ def main():
                         'detailed_analysis': detailed_analysis,
                         'files_processed': len(uploaded_files),
                         'generated_at': datetime.now().isoformat(),
+                        'analysis_key': hashlib.blake2b(
+                            repr(([(f.name, f.file_id) for f in uploaded_files], start_date, end_date)).encode('utf-8'),
+                            digest_size=8
+                        ).hexdigest(),
                         'analyzer_params': {
-                            'results_dir': str(results_dir),
+                            'results_dir': str(RESULTS_DIR),
                             'start_date': start_date,
                             'end_date': end_date
                         }
@@ -249,13 +533,15 @@ def main():
                         'end_date': end_date
                     }
 
-                    # Guardar Excel en memoria
-                    st.session_state.excel_data = analyzer.generate_excel_report(
-                        total_counter, total_rows, len(uploaded_files), detailed_analysis
-                    )
+                    # Guardar Excel en memoria (ya generado dentro del análisis cacheado)
+                    st.session_state.excel_data = results['excel_data']
 
-                    # Guardar analizador para reutilizar sus métodos sin recalcular
-                    st.session_state.last_analyzer = analyzer
+                    # Guardar las tablas de visualización ya materializadas
+                    st.session_state.ranked = results['ranked']
+                    st.session_state.routes_df = results['routes_df']
+                    st.session_state.installers_df = results['installers_df']
+                    st.session_state.installers_pivot = results['installers_pivot']
+                    st.session_state.subcategory_df = results['subcategory_df']
 
                     # Mostrar notificación de éxito
                     st.success(f"✅ Análisis completado: {total_rows:,} filas procesadas")
@@ -273,16 +559,6 @@ def main():
         detailed_analysis = analysis_data['detailed_analysis']
         files_processed = analysis_data['files_processed']
 
-        analyzer_params = analysis_data.get('analyzer_params', {})
-        display_analyzer = st.session_state.get('last_analyzer')
-        if display_analyzer is None:
-            display_analyzer = ExcelCategoryAnalyzer(
-                results_dir=analyzer_params.get('results_dir', str(Path(__file__).parent.parent / "results")),
-                start_date=analyzer_params.get('start_date'),
-                end_date=analyzer_params.get('end_date')
-            )
-
-
         # Botón de descarga alineado a la derecha
         excel_data = st.session_state.get('excel_data')
         if excel_data:
@@ -298,10 +574,19 @@ def main():
                     use_container_width=True
                 )
                 
-        # Crear pestañas para organizar la información
-        tab1, tab2 = st.tabs(["📊 Resumen Ejecutivo", "📈 Gráficos"])
-
-        with tab1:
+        # Tablas calculadas una sola vez al ejecutar el análisis
+        subcategory_df = st.session_state.get('subcategory_df')
+        routes_df = st.session_state.get('routes_df')
+        ranked = st.session_state.get('ranked')
+        installers_df = st.session_state.get('installers_df')
+        installers_pivot = st.session_state.get('installers_pivot')
+
+        # Selector de vista: a diferencia de st.tabs, solo se ejecuta la vista elegida,
+        # así los gráficos no se construyen mientras se consulta el resumen
+        vistas = ["📊 Resumen Ejecutivo", "📈 Gráficos"]
+        vista = st.radio("Vista", vistas, horizontal=True, key="vista", label_visibility="collapsed")
+
+        if vista == vistas[0]:
             st.header("📊 Resumen Ejecutivo")
 
             # Métricas principales
@@ -324,18 +609,20 @@ def main():
             # Ranking de categorías generales (alineado con el reporte Excel)
             st.subheader("🏆 Ranking de Categorías Generales")
 
-            if total_counter:
-                top_general = total_counter.most_common()
-                df_top_general = pd.DataFrame([
-                    {
-                        "Ranking": idx,
-                        "Categoría": category,
-                        "Llamadas": count,
-                        "% del Total": f"{(count / total_rows * 100) if total_rows > 0 else 0:.1f}%",
-                        "Impacto Operativo": display_analyzer.get_business_impact_category(category, (count / total_rows * 100) if total_rows > 0 else 0)
-                    }
-                    for idx, (category, count) in enumerate(top_general, start=1)
-                ])
+            if ranked is not None and len(ranked[1]):
+                categories, counts = ranked
+                percentages = ExcelCategoryAnalyzer.percent_of_total(counts, total_rows)
+
+                # Impacto operativo vectorizado con los mismos umbrales que el analizador
+                impact = ExcelCategoryAnalyzer.classify_impact(percentages)
+
+                df_top_general = pd.DataFrame({
+                    "Ranking": np.arange(1, len(categories) + 1),
+                    "Categoría": categories,
+                    "Llamadas": counts,
+                    "% del Total": percentages,
+                    "Impacto Operativo": impact
+                })
 
                 st.dataframe(
                     df_top_general,
@@ -344,7 +631,7 @@ def main():
                         "Ranking": st.column_config.NumberColumn("Ranking", format="%02d"),
                         "Categoría": st.column_config.TextColumn("Categoría", width="large"),
                         "Llamadas": st.column_config.NumberColumn("Llamadas", format="%d"),
-                        "% del Total": st.column_config.TextColumn("% del Total"),
+                        "% del Total": st.column_config.NumberColumn("% del Total", format="%.1f%%"),
                         "Impacto Operativo": st.column_config.TextColumn("Impacto Operativo", width="medium")
                     }
                 )
@@ -353,8 +640,6 @@ def main():
 
             # Análisis de subcategorías destacado (como en el Excel)
             st.subheader("🔍 Análisis de Subcategorías")
-            subcategory_df = display_analyzer.generate_subcategory_analysis(detailed_analysis, total_rows)
-
             if subcategory_df is not None and not subcategory_df.empty:
                 st.dataframe(
                     subcategory_df,
@@ -372,34 +657,16 @@ def main():
 
             # Desglose completo de rutas Categoria General -> Específica -> Subtipo
             st.subheader("🧭 Rutas Completas de Motivos")
-            combined_detail = detailed_analysis.get('categoria_combinada_detalle') if detailed_analysis else None
-
-            if combined_detail:
-                df_routes = pd.DataFrame(combined_detail)
-
-                # Agregar recuento por ruta y porcentaje
-                route_counts = df_routes['ruta_completa'].value_counts().reset_index()
-                route_counts.columns = ['ruta_completa', 'Frecuencia']
-                route_counts['% del Total'] = route_counts['Frecuencia'] / total_rows * 100 if total_rows > 0 else 0
-
-                # Extraer columnas separadas
-                df_routes_display = route_counts.merge(
-                    df_routes.drop_duplicates('ruta_completa')[['ruta_completa', 'categoria_general', 'categoria_especifica', 'subtipo']],
-                    on='ruta_completa',
-                    how='left'
-                )
-
-                df_routes_display['% del Total'] = df_routes_display['% del Total'].apply(lambda x: f"{x:.2f}%")
-
+            if routes_df is not None:
                 st.dataframe(
-                    df_routes_display,
+                    routes_df,
                     use_container_width=True,
                     column_config={
                         'categoria_general': st.column_config.TextColumn('Categoría General', width='large'),
                         'categoria_especifica': st.column_config.TextColumn('Categoría Específica', width='large'),
                         'subtipo': st.column_config.TextColumn('Subtipo', width='large'),
                         'Frecuencia': st.column_config.NumberColumn('Frecuencia', format='%d'),
-                        '% del Total': st.column_config.TextColumn('% del Total'),
+                        '% del Total': st.column_config.NumberColumn('% del Total', format='%.2f%%'),
                         'ruta_completa': st.column_config.TextColumn('Ruta Completa', width='large')
                     }
                 )
@@ -408,14 +675,9 @@ def main():
 
             # Desglose de categorías por agente instalador
             st.subheader("👷‍♂️ Agentes Instaladores por Categoría")
-            installer_detail = detailed_analysis.get('agente_instalador_detalle') if detailed_analysis else None
-
-            if installer_detail:
-                df_installers = pd.DataFrame(installer_detail)
-                df_installers['% del Agente'] = df_installers['Porcentaje_Agente'].apply(lambda x: f"{x:.2f}%" if isinstance(x, (int, float)) else x)
-
+            if installers_df is not None:
                 st.dataframe(
-                    df_installers,
+                    installers_df,
                     use_container_width=True,
                     column_config={
                         'agente_instalador': st.column_config.TextColumn('Agente Instalador', width='large'),
@@ -423,128 +685,66 @@ def main():
                         'categoria_especifica': st.column_config.TextColumn('Categoría Específica', width='large'),
                         'subtipo': st.column_config.TextColumn('Subtipo', width='large'),
                         'Frecuencia': st.column_config.NumberColumn('Frecuencia', format='%d'),
-                        '% del Agente': st.column_config.TextColumn('% del Agente'),
+                        '% del Agente': st.column_config.NumberColumn('% del Agente', format='%.2f%%'),
                         'ruta_completa': st.column_config.TextColumn('Ruta Completa', width='large')
                     }
                 )
             else:
                 st.info("No se pudo generar el análisis por agentes instaladores.")
 
-        with tab2:
+        elif vista == vistas[1]:
             st.header("📈 Visualizaciones")
 
+            # Clave estable por análisis: mientras los datos no cambien, los gráficos
+            # conservan su identidad entre reruns y el frontend no los reconstruye
+            chart_key = analysis_data.get('analysis_key', 'actual')
+
             # Gráfico de categorías principales
             st.subheader("🏆 Ranking de Categorías Generales")
-            fig_categories = crear_grafico_categorias(total_counter, "Top 20 Categorías Más Frecuentes")
+            fig_categories = crear_grafico_categorias(tuple(zip(ranked[0][:20], ranked[1][:20].tolist())), "Top 20 Categorías Más Frecuentes")
             if fig_categories:
-                st.plotly_chart(fig_categories, use_container_width=True)
+                st.plotly_chart(fig_categories, use_container_width=True, key=f"cats_{chart_key}")
 
             # Gráfico de distribución
             st.subheader("📊 Distribución de Llamadas por Volumen")
-            fig_distribution = crear_grafico_distribucion(total_counter, total_rows)
+            fig_distribution = crear_grafico_distribucion(tuple(total_counter.items()), total_rows)
             if fig_distribution:
-                st.plotly_chart(fig_distribution, use_container_width=True)
+                st.plotly_chart(fig_distribution, use_container_width=True, key=f"dist_{chart_key}")
 
             # Gráfico de subcategorías
             st.subheader("🔍 Top Subcategorías")
-            subcategory_df = display_analyzer.generate_subcategory_analysis(detailed_analysis, total_rows)
             if subcategory_df is not None and not subcategory_df.empty:
-                # Tomar top 15 subcategorías
-                top_subcats = subcategory_df.head(15).copy()
-                fig_subcats = px.bar(
-                    top_subcats,
-                    y='Subcategoría',
-                    x='Frecuencia',
-                    orientation='h',
-                    title='Top 15 Subcategorías Más Frecuentes',
-                    labels={'Frecuencia': 'Número de Llamadas', 'Subcategoría': 'Subcategoría'},
-                    color='Frecuencia',
-                    color_continuous_scale='Viridis',
-                    text='Frecuencia'
-                )
-                fig_subcats.update_layout(
-                    height=500,
-                    yaxis={'categoryorder': 'total ascending'},
-                    showlegend=False
+                # La tabla ya viene limitada a las principales de cada tipo y agrupada por tipo
+                # (no es un ranking único), así que se muestra completa y sin aplicar Top K
+                top_subcats = subcategory_df[['Subcategoría', 'Frecuencia']]
+                fig_subcats = crear_grafico_subcategorias(
+                    tuple(top_subcats.itertuples(index=False, name=None)),
+                    f"Top {len(top_subcats)} Subcategorías Más Frecuentes"
                 )
-                fig_subcats.update_traces(texttemplate='%{text}', textposition='outside')
-                st.plotly_chart(fig_subcats, use_container_width=True)
+                st.plotly_chart(fig_subcats, use_container_width=True, key=f"subcats_{chart_key}")
 
             # Gráfico de rutas completas
             st.subheader("🧭 Top Rutas Completas de Motivos")
-            combined_detail = detailed_analysis.get('categoria_combinada_detalle') if detailed_analysis else None
-            if combined_detail:
-                df_routes = pd.DataFrame(combined_detail)
-                route_counts = df_routes['ruta_completa'].value_counts().head(15).reset_index()
-                route_counts.columns = ['ruta_completa', 'Frecuencia']
-                
-                fig_routes = px.bar(
-                    route_counts,
-                    y='ruta_completa',
-                    x='Frecuencia',
-                    orientation='h',
-                    title='Top 15 Rutas Completas Más Frecuentes',
-                    labels={'Frecuencia': 'Número de Llamadas', 'ruta_completa': 'Ruta Completa'},
-                    color='Frecuencia',
-                    color_continuous_scale='Blues',
-                    text='Frecuencia'
-                )
-                fig_routes.update_layout(
-                    height=600,
-                    yaxis={'categoryorder': 'total ascending'},
-                    showlegend=False
+            if routes_df is not None:
+                route_counts = topk_with_tail(routes_df.set_index('ruta_completa')['Frecuencia'], top_k)
+                fig_routes = crear_grafico_rutas(
+                    tuple(route_counts.items()), f"Top {top_k} Rutas Completas Más Frecuentes"
                 )
-                fig_routes.update_traces(texttemplate='%{text}', textposition='outside')
-                st.plotly_chart(fig_routes, use_container_width=True)
+                st.plotly_chart(fig_routes, use_container_width=True, key=f"routes_{chart_key}")
 
             # Gráfico de agentes instaladores
             st.subheader("👷‍♂️ Top Agentes Instaladores por Frecuencia")
-            installer_detail = detailed_analysis.get('agente_instalador_detalle') if detailed_analysis else None
-            if installer_detail:
-                df_installers = pd.DataFrame(installer_detail)
-                # Agrupar por agente instalador y sumar frecuencias
-                installers_grouped = df_installers.groupby('agente_instalador')['Frecuencia'].sum().reset_index()
-                installers_grouped = installers_grouped.sort_values('Frecuencia', ascending=False).head(15)
-                
-                fig_installers = px.bar(
-                    installers_grouped,
-                    x='agente_instalador',
-                    y='Frecuencia',
-                    title='Top 15 Agentes Instaladores por Llamadas',
-                    labels={'Frecuencia': 'Total de Llamadas', 'agente_instalador': 'Agente Instalador'},
-                    color='Frecuencia',
-                    color_continuous_scale='Oranges',
-                    text='Frecuencia'
+            if installers_pivot is not None:
+                agent_totals = topk_with_tail(installers_pivot.sum(axis=1), top_k)
+                fig_installers = crear_grafico_agentes(
+                    tuple(agent_totals.items()), f"Top {top_k} Agentes Instaladores por Llamadas"
                 )
-                fig_installers.update_layout(
-                    height=500,
-                    xaxis={'categoryorder': 'total descending'},
-                    showlegend=False
-                )
-                fig_installers.update_traces(texttemplate='%{text}', textposition='outside')
-                fig_installers.update_xaxes(tickangle=-45)
-                st.plotly_chart(fig_installers, use_container_width=True)
-                
+                st.plotly_chart(fig_installers, use_container_width=True, key=f"installers_{chart_key}")
+
                 # Gráfico de categorías por agente (top 10 agentes)
                 st.subheader("📊 Distribución de Categorías por Agente Instalador")
-                top_10_agents = installers_grouped.head(10)['agente_instalador'].tolist()
-                df_agents_categories = df_installers[df_installers['agente_instalador'].isin(top_10_agents)]
-                
-                # Agrupar por agente y categoría general
-                agents_cat_grouped = df_agents_categories.groupby(['agente_instalador', 'categoria_general'])['Frecuencia'].sum().reset_index()
-                
-                fig_agents_cat = px.bar(
-                    agents_cat_grouped,
-                    x='agente_instalador',
-                    y='Frecuencia',
-                    color='categoria_general',
-                    title='Distribución de Categorías por Top 10 Agentes',
-                    labels={'Frecuencia': 'Número de Llamadas', 'agente_instalador': 'Agente', 'categoria_general': 'Categoría'},
-                    barmode='stack'
-                )
-                fig_agents_cat.update_layout(height=500)
-                fig_agents_cat.update_xaxes(tickangle=-45)
-                st.plotly_chart(fig_agents_cat, use_container_width=True)
+                fig_agents_cat = crear_grafico_agentes_categorias(installers_pivot.head(10))
+                st.plotly_chart(fig_agents_cat, use_container_width=True, key=f"agents_cat_{chart_key}")
     else:
         # Pantalla inicial cuando no hay archivos
         st.info("👆 Sube archivos Excel desde la barra lateral para comenzar el análisis.")
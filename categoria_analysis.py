@@ -13,14 +13,45 @@ import os
 import sys
 import argparse
 import pandas as pd
+import numpy as np
 from collections import Counter
 import logging
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Union, BinaryIO, Iterable
 from pathlib import Path
 from datetime import datetime, timedelta
 import io
 import re
+import hashlib
+import heapq
 import unicodedata
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+PANDAS_VERSION = tuple(int(part) for part in re.findall(r'\d+', pd.__version__)[:2])
+
+try:
+    import python_calamine  # noqa: F401
+    # pandas solo admite engine='calamine' desde la 2.2; en versiones anteriores se usa openpyxl
+    EXCEL_READ_ENGINE = 'calamine' if PANDAS_VERSION >= (2, 2) else None
+except ImportError:
+    EXCEL_READ_ENGINE = None
+
+try:
+    import pyarrow  # noqa: F401
+    import pyarrow.parquet as pq
+    ARROW_STRING_DTYPE = 'string[pyarrow]'
+    PARQUET_CACHE_AVAILABLE = True
+except ImportError:
+    ARROW_STRING_DTYPE = None
+    PARQUET_CACHE_AVAILABLE = False
+
+try:
+    import xlsxwriter  # noqa: F401
+    EXCEL_WRITE_ENGINE = 'xlsxwriter'
+except ImportError:
+    EXCEL_WRITE_ENGINE = 'openpyxl'
 
 # Configurar logging
 logging.basicConfig(
@@ -33,6 +64,31 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Formato de los encabezados de tabla en los reportes (el mismo que aplica pandas)
+HEADER_FORMAT = {'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'}
+
+# Fuente de datos Excel: ruta en disco, o tupla (nombre, buffer/ruta) para archivos en memoria
+ExcelSource = Union[str, Path, Tuple[str, Union[str, Path, BinaryIO]]]
+
+@lru_cache(maxsize=4096, typed=True)
+def normalize_column_name(name: str) -> str:
+    """Normalizar nombre de columna para comparaciones flexibles.
+
+    Se memoriza por nombre: los mismos encabezados y objetivos se comparan muchas veces
+    por archivo. ``typed=True`` evita mezclar claves como ``1`` y ``1.0``.
+    """
+    if name is None:
+        return ""
+
+    text = str(name)
+    if text.isascii():
+        # Texto ASCII: NFKD no lo altera y no hay marcas diacríticas que quitar
+        return ''.join(ch for ch in text.lower() if ch.isalnum())
+
+    normalized = unicodedata.normalize('NFKD', text)
+    without_accents = ''.join(ch for ch in normalized if not unicodedata.combining(ch))
+    return ''.join(ch for ch in without_accents.lower() if ch.isalnum())
+
 class ExcelCategoryAnalyzer:
     """Analizador de categorías en archivos Excel de resultados de llamadas."""
 
@@ -59,22 +115,77 @@ class ExcelCategoryAnalyzer:
         'tecnico', 'agenteinstalador', 'instalador_agente'
     ]
 
-    DATE_WITH_TIME_REGEX = re.compile(r'(\d{4}-\d{2}-\d{2})[ _T-](\d{2})[-:](\d{2})[-:](\d{2})')
-    DATE_ONLY_REGEX = re.compile(r'(\d{4}-\d{2}-\d{2})')
+    # Objetivos de búsqueda junto con su forma normalizada, calculada una sola vez al definir la clase
+    CATEGORY_TARGETS = tuple((target, normalize_column_name(target)) for target in ['categoria_general'] + CATEGORY_COLUMNS)
+    SPECIFIC_CATEGORY_TARGETS = tuple((target, normalize_column_name(target)) for target in SPECIFIC_CATEGORY_COLUMNS)
+    INSTALLER_TARGETS = tuple((target, normalize_column_name(target)) for target in INSTALLER_COLUMNS)
 
-    @staticmethod
-    def normalize_column_name(name: str) -> str:
-        """Normalizar nombre de columna para comparaciones flexibles."""
-        if name is None:
-            return ""
+    normalize_column_name = staticmethod(normalize_column_name)
+
+    # Palabras clave para identificar columnas cuando no hay coincidencia por nombre
+    CATEGORY_KEYWORDS = ['categoria', 'category', 'tipo', 'motivo']
+    INSTALLER_KEYWORDS = ['instalador', 'tecnico', 'agente']
+    DATE_KEYWORDS = ['fecha', 'date', 'dia', 'time', 'archivo']
+
+    # Posibles nombres de columnas de fecha
+    DATE_COLUMN_NAMES = [
+        'fecha', 'date', 'fecha_llamada', 'fecha_hora', 'timestamp',
+        'fecha_inicio', 'fecha_fin', 'fecha_creacion', 'created_date',
+        'dia', 'day', 'fecha_registro', 'fecha_contacto', 'archivo_procesado'
+    ]
+
+    # Tamaño total (bytes) a partir del cual compensa arrancar procesos para analizar archivos en disco
+    PROCESS_POOL_MIN_BYTES = 8 * 1024 * 1024
 
-        normalized = unicodedata.normalize('NFKD', str(name))
-        without_accents = ''.join(ch for ch in normalized if not unicodedata.combining(ch))
-        return ''.join(ch for ch in without_accents.lower() if ch.isalnum())
+    # Filas que write_frame convierte a la vez en valores de Python al escribir con xlsxwriter
+    EXCEL_WRITE_CHUNK_ROWS = 10_000
 
-    def find_matching_columns(self, df: pd.DataFrame, target_name: str) -> List[str]:
-        """Encontrar columnas que coincidan (exacta o parcialmente) con un nombre objetivo."""
-        norm_target = self.normalize_column_name(target_name)
+    # Subdirectorio (dentro de results_dir) donde se guardan las lecturas en Parquet
+    CACHE_DIRNAME = '.cache'
+
+    # Columnas de texto repetitivo en los detalles combinados; se manejan como categóricas
+    DETAIL_CATEGORY_COLUMNS = [
+        'agente_instalador', 'categoria_general', 'categoria_especifica', 'subtipo', 'ruta_completa'
+    ]
+
+    # Columnas (en orden) del detalle combinado, que se guarda como diccionario de listas
+    COMBINED_DETAIL_COLUMNS = (
+        'categoria_general', 'categoria_especifica', 'subtipo', 'ruta_completa', 'agente_instalador'
+    )
+
+    # Columnas (en orden) del desglose por agente instalador, también como diccionario de listas
+    INSTALLER_DETAIL_COLUMNS = (
+        'agente_instalador', 'categoria_general', 'categoria_especifica', 'subtipo', 'ruta_completa',
+        'Frecuencia', 'Porcentaje_Agente'
+    )
+
+    # Umbrales (% del total de llamadas) y etiquetas de impacto operativo, de mayor a menor
+    BUSINESS_IMPACT_LEVELS = [
+        (30, "Crítico - Alto volumen"),
+        (15, "Importante - Optimización"),
+        (5, "Moderado - Monitoreo")
+    ]
+    BUSINESS_IMPACT_DEFAULT = "Bajo - Especializado"
+
+    # Prioridad de negocio de las subcategorías según su % del total
+    BUSINESS_PRIORITY_LEVELS = [
+        (5, "Alta"),
+        (2, "Media")
+    ]
+    BUSINESS_PRIORITY_DEFAULT = "Baja"
+
+    # Fecha AAAA-MM-DD con hora opcional; una sola búsqueda devuelve ambas partes
+    DATE_COMBINED_REGEX = re.compile(
+        r'(?P<date>\d{4}-\d{2}-\d{2})(?:[ _T-](?P<h>\d{2})[-:](?P<m>\d{2})[-:](?P<s>\d{2}))?'
+    )
+
+    def find_matching_columns(self, df: pd.DataFrame, target_name: str, norm_target: Optional[str] = None) -> List[str]:
+        """Encontrar columnas que coincidan (exacta o parcialmente) con un nombre objetivo.
+
+        ``norm_target`` permite pasar el objetivo ya normalizado (ver ``*_TARGETS``).
+        """
+        if norm_target is None:
+            norm_target = self.normalize_column_name(target_name)
 
         matches = []
         for column in df.columns:
@@ -98,18 +209,17 @@ class ExcelCategoryAnalyzer:
 
         value_str = str(value)
 
-        match = self.DATE_WITH_TIME_REGEX.search(value_str)
+        match = self.DATE_COMBINED_REGEX.search(value_str)
         if match:
-            dt_str = f"{match.group(1)} {match.group(2)}:{match.group(3)}:{match.group(4)}"
-            try:
-                return datetime.strptime(dt_str, "%Y-%m-%d %H:%M:%S")
-            except ValueError:
-                pass
+            if match.group('h') is not None:
+                dt_str = f"{match.group('date')} {match.group('h')}:{match.group('m')}:{match.group('s')}"
+                try:
+                    return datetime.strptime(dt_str, "%Y-%m-%d %H:%M:%S")
+                except ValueError:
+                    pass
 
-        match = self.DATE_ONLY_REGEX.search(value_str)
-        if match:
             try:
-                return datetime.strptime(match.group(1), "%Y-%m-%d")
+                return datetime.strptime(match.group('date'), "%Y-%m-%d")
             except ValueError:
                 pass
 
@@ -118,33 +228,94 @@ class ExcelCategoryAnalyzer:
         except Exception:
             return pd.NaT
 
+    def parse_datetime_series(self, values: pd.Series) -> pd.Series:
+        """Versión vectorizada de ``parse_datetime_value`` para una columna completa.
+
+        Aplica los mismos pasos en el mismo orden (fecha y hora, solo fecha, análisis libre),
+        pero cada uno sobre todas las filas pendientes a la vez.
+        """
+        # Todo se hace por posición: el índice puede tener etiquetas repetidas (p. ej. tras un concat)
+        present = values.notna().to_numpy()
+        text = values[present].astype(str)
+        if text.empty:
+            return pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+
+        parts = text.str.extract(self.DATE_COMBINED_REGEX)
+        parsed = pd.to_datetime(
+            parts['date'] + ' ' + parts['h'] + ':' + parts['m'] + ':' + parts['s'],
+            format='%Y-%m-%d %H:%M:%S',
+            errors='coerce'
+        )
+
+        missing = parsed.isna().to_numpy()
+        if missing.any():
+            parsed[missing] = pd.to_datetime(parts['date'][missing], format='%Y-%m-%d', errors='coerce').to_numpy()
+
+        missing = parsed.isna().to_numpy()
+        if missing.any():
+            # Cada valor se interpreta por separado, como en la conversión escalar
+            parsed[missing] = pd.to_datetime(text[missing], format='mixed', errors='coerce').to_numpy()
+
+        result = pd.Series(pd.NaT, index=values.index, dtype=parsed.dtype)
+        result[present] = parsed.to_numpy()
+        return result
+
+    def normalized_columns(self, df: pd.DataFrame) -> List[Tuple[str, str]]:
+        """Pares (columna, nombre normalizado) en el orden del DataFrame, sin los que quedan vacíos."""
+        norm_columns = []
+        for column in df.columns:
+            norm_column = self.normalize_column_name(column)
+            if norm_column:
+                norm_columns.append((column, norm_column))
+        return norm_columns
+
+    @staticmethod
+    def first_matching_column(norm_columns: List[Tuple[str, str]],
+                              targets: Tuple[Tuple[str, str], ...]) -> Tuple[Optional[str], Optional[str]]:
+        """Primera columna que coincide con algún objetivo, recorriendo los objetivos por prioridad.
+
+        Usa el mismo criterio que ``find_matching_columns`` (igualdad o inclusión en cualquier
+        sentido) sobre columnas ya normalizadas una sola vez.
+
+        Returns:
+            Tupla (columna, objetivo que coincidió), o (None, None) si no hay coincidencias
+        """
+        for target, norm_target in targets:
+            for column, norm_column in norm_columns:
+                if norm_target in norm_column or norm_column in norm_target:
+                    return column, target
+        return None, None
+
     def identify_installer_column(self, df: pd.DataFrame) -> Optional[str]:
         """Identificar columna que contiene el agente instalador."""
 
+        norm_columns = self.normalized_columns(df)
+
         # Intentar coincidencias específicas
-        for target in self.INSTALLER_COLUMNS:
-            matches = self.find_matching_columns(df, target)
-            if matches:
-                logger.info(f"Columna de agente instalador identificada: '{matches[0]}' (coincide con '{target}')")
-                return matches[0]
+        column, target = self.first_matching_column(norm_columns, self.INSTALLER_TARGETS)
+        if column is not None:
+            logger.info(f"Columna de agente instalador identificada: '{column}' (coincide con '{target}')")
+            return column
 
         # Buscar por palabra clave
-        for col in df.columns:
-            norm_col = self.normalize_column_name(col)
-            if any(keyword in norm_col for keyword in ['instalador', 'tecnico', 'agente']):
+        for col, norm_col in norm_columns:
+            if any(keyword in norm_col for keyword in self.INSTALLER_KEYWORDS):
                 logger.info(f"Columna de agente instalador identificada (por palabra clave): '{col}'")
                 return col
 
         logger.warning("No se pudo identificar una columna de agente instalador")
         return None
 
-    def __init__(self, results_dir: str = None, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None):
+    def __init__(self, results_dir: str = None, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                 use_cache: bool = True, max_workers: Optional[int] = None):
         """Inicializar el analizador.
 
         Args:
             results_dir: Directorio donde se encuentran los archivos Excel de resultados
             start_date: Fecha de inicio para filtrar datos
             end_date: Fecha de fin para filtrar datos
+            use_cache: Guardar y reutilizar en Parquet las lecturas de archivos en disco
+            max_workers: Máximo de archivos analizados en paralelo (por defecto, según los núcleos)
         """
         if results_dir is None:
             # Usar el directorio results relativo al script
@@ -159,6 +330,8 @@ class ExcelCategoryAnalyzer:
 
         self.start_date = start_date
         self.end_date = end_date
+        self.use_cache = use_cache and PARQUET_CACHE_AVAILABLE
+        self.max_workers = max_workers
 
         logger.info(f"Directorio de resultados: {self.results_dir}")
         if start_date:
@@ -198,21 +371,17 @@ class ExcelCategoryAnalyzer:
         Returns:
             Nombre de la columna identificada como categoría, o None si no se encuentra
         """
-        # Buscar columnas candidatas utilizando coincidencias flexibles
-        candidate_targets = ['categoria_general'] + self.CATEGORY_COLUMNS
+        norm_columns = self.normalized_columns(df)
 
-        for target in candidate_targets:
-            matches = self.find_matching_columns(df, target)
-            if matches:
-                logger.info(
-                    f"Columna de categoría identificada: '{matches[0]}' (coincide con '{target}')"
-                )
-                return matches[0]
+        # Buscar columnas candidatas utilizando coincidencias flexibles
+        column, target = self.first_matching_column(norm_columns, self.CATEGORY_TARGETS)
+        if column is not None:
+            logger.info(f"Columna de categoría identificada: '{column}' (coincide con '{target}')")
+            return column
 
         # Buscar columnas que contengan palabras clave
-        for col in df.columns:
-            norm_col = self.normalize_column_name(col)
-            if any(keyword in norm_col for keyword in ['categoria', 'category', 'tipo', 'motivo']):
+        for col, norm_col in norm_columns:
+            if any(keyword in norm_col for keyword in self.CATEGORY_KEYWORDS):
                 logger.info(f"Columna de categoría identificada (por palabra clave): '{col}'")
                 return col
 
@@ -222,6 +391,92 @@ class ExcelCategoryAnalyzer:
                 logger.info(f"Usando primera columna no numérica como categoría: '{col}'")
                 return col
 
+    @staticmethod
+    def counts_to_counter(values: pd.Series) -> Counter:
+        """Contar valores con ``value_counts`` y devolver el resultado agregado como ``Counter``.
+
+        Con ``sort=False`` se conserva el orden de primera aparición, igual que ``Counter(iterable)``.
+        """
+        counts = values.value_counts(sort=False)
+        return Counter(dict(zip(counts.index, counts.tolist())))
+
+    @staticmethod
+    def strip_text(values: pd.Series) -> pd.Series:
+        """Convertir los valores a texto sin espacios en los extremos.
+
+        Las columnas que ya son de cadenas (p. ej. Arrow) se recortan directamente, sin copiarlas
+        a otro tipo. Las ``object`` sí pasan por ``astype(str)``: pueden mezclar números con
+        texto y, además, recortar sobre cadenas Arrow es más rápido que sobre objetos Python.
+        """
+        if values.dtype != object and pd.api.types.is_string_dtype(values):
+            return values.str.strip()
+        return values.astype(str).str.strip()
+
+    @staticmethod
+    def rank_counts(counter: Counter) -> Tuple[np.ndarray, np.ndarray]:
+        """Ordenar un contador de mayor a menor frecuencia, como ``counter.most_common()``.
+
+        El orden se calcula con un ``argsort`` estable de NumPy sobre las frecuencias (los
+        empates conservan el orden de inserción, igual que ``most_common``).
+
+        Returns:
+            Tupla con (arreglo ``object`` de claves, arreglo ``int64`` de frecuencias)
+        """
+        keys = np.fromiter(counter.keys(), dtype=object, count=len(counter))
+        counts = np.fromiter(counter.values(), dtype=np.int64, count=len(counter))
+        order = np.argsort(-counts, kind='stable')
+        return keys[order], counts[order]
+
+    @staticmethod
+    def percent_of_total(counts: Union[np.ndarray, pd.Series], total_rows: int) -> np.ndarray:
+        """Porcentaje de cada frecuencia sobre el total de llamadas (ceros si no hay llamadas)."""
+        counts = np.asarray(counts)
+        return counts / total_rows * 100 if total_rows > 0 else np.zeros(len(counts))
+
+    @classmethod
+    def count_values(cls, values: pd.Series) -> Counter:
+        """Contar valores como texto, sin espacios en los extremos."""
+        return cls.counts_to_counter(cls.strip_text(values))
+
+    @classmethod
+    def detail_frame(cls, records: Union[List[Dict[str, str]], Dict[str, List[str]]]) -> pd.DataFrame:
+        """Construir un DataFrame de detalles con las columnas de categoría como ``category``.
+
+        Acepta tanto una lista de registros como un diccionario de listas por columna.
+
+        Así las agrupaciones posteriores trabajan sobre códigos enteros en lugar de
+        volver a hashear las mismas cadenas fila a fila.
+        """
+        df = pd.DataFrame(records)
+        for col in cls.DETAIL_CATEGORY_COLUMNS:
+            if col in df.columns:
+                df[col] = df[col].astype('category')
+        return df
+
+    @classmethod
+    def group_routes(cls, records: Union[List[Dict[str, str]], Dict[str, List[str]]]) -> pd.DataFrame:
+        """Contar cada ruta completa en una sola agrupación, de mayor a menor frecuencia.
+
+        Una misma ruta puede venir de divisiones distintas (p. ej. ``'X | A'`` con la ``A``
+        como categoría específica o como subtipo), así que se agrupa solo por la ruta y las
+        columnas de categoría se toman de su primera aparición.
+
+        Returns:
+            DataFrame con ruta_completa, Frecuencia, categoria_general, categoria_especifica y subtipo
+        """
+        return (
+            cls.detail_frame(records)
+            .groupby('ruta_completa', sort=False, observed=True)
+            .agg(
+                Frecuencia=('ruta_completa', 'size'),
+                categoria_general=('categoria_general', 'first'),
+                categoria_especifica=('categoria_especifica', 'first'),
+                subtipo=('subtipo', 'first')
+            )
+            .reset_index()
+            .sort_values('Frecuencia', ascending=False, kind='stable', ignore_index=True)
+        )
+
     def split_comma_categories(self, categories_series: pd.Series) -> pd.Series:
         """Separar categorías que contienen comas en categorías independientes.
 
@@ -255,37 +510,39 @@ class ExcelCategoryAnalyzer:
         Returns:
             Nombre de la columna identificada como fecha, o None si no se encuentra
         """
-        df_columns_lower = [col.lower() for col in df.columns]
-
-        # Posibles nombres de columnas de fecha
-        date_column_names = [
-            'fecha', 'date', 'fecha_llamada', 'fecha_hora', 'timestamp',
-            'fecha_inicio', 'fecha_fin', 'fecha_creacion', 'created_date',
-            'dia', 'day', 'fecha_registro', 'fecha_contacto', 'archivo_procesado'
-        ]
+        # Índice inverso nombre en minúsculas -> primera columna con ese nombre
+        columns_by_lower = {}
+        for col in df.columns:
+            columns_by_lower.setdefault(col.lower(), col)
 
         # Buscar coincidencias exactas
-        for date_col in date_column_names:
-            if date_col in df_columns_lower:
-                original_col = df.columns[df_columns_lower.index(date_col)]
+        for date_col in self.DATE_COLUMN_NAMES:
+            original_col = columns_by_lower.get(date_col)
+            if original_col is not None:
                 logger.info(f"Columna de fecha identificada: '{original_col}'")
                 return original_col
 
         # Buscar columnas que contengan palabras clave de fecha
-        for col in df.columns:
-            norm_col = self.normalize_column_name(col)
-            if any(keyword in norm_col for keyword in ['fecha', 'date', 'dia', 'time', 'archivo']):
+        for col, norm_col in self.normalized_columns(df):
+            if any(keyword in norm_col for keyword in self.DATE_KEYWORDS):
                 logger.info(f"Columna de fecha identificada (por palabra clave): '{col}'")
                 return col
 
         # Fallback: detectar columnas cuyos valores contienen patrones de fecha
-        for col in df.columns:
-            sample_series = df[col].dropna()
-            if sample_series.empty:
+        for position, col in enumerate(df.columns):
+            values = df.iloc[:, position]
+
+            # Un número convertido a texto nunca contiene un patrón AAAA-MM-DD
+            if pd.api.types.is_numeric_dtype(values):
                 continue
 
-            sample_value = str(sample_series.iloc[0])
-            if self.DATE_WITH_TIME_REGEX.search(sample_value) or self.DATE_ONLY_REGEX.search(sample_value):
+            # Tomar el primer valor no nulo sin copiar la columna
+            valid = values.notna().to_numpy()
+            if not valid.any():
+                continue
+
+            sample_value = str(values.iat[int(valid.argmax())])
+            if self.DATE_COMBINED_REGEX.search(sample_value):
                 logger.info(f"Columna de fecha identificada (por patrón en valores): '{col}'")
                 return col
 
@@ -314,16 +571,19 @@ class ExcelCategoryAnalyzer:
         try:
             # Convertir columna a datetime si no lo está
             if not pd.api.types.is_datetime64_any_dtype(df[date_column]):
-                df[date_column] = df[date_column].apply(self.parse_datetime_value)
+                df[date_column] = self.parse_datetime_series(df[date_column])
 
-            # Aplicar filtro de fechas
-            filtered_df = df.copy()
+            # Aplicar filtro de fechas con una sola máscara, sin copiar antes el DataFrame completo
+            dates = df[date_column]
+            mask = np.ones(len(df), dtype=bool)
 
             if self.start_date:
-                filtered_df = filtered_df[filtered_df[date_column] >= self.start_date]
+                mask &= (dates >= self.start_date).to_numpy()
 
             if self.end_date:
-                filtered_df = filtered_df[filtered_df[date_column] <= self.end_date]
+                mask &= (dates <= self.end_date).to_numpy()
+
+            filtered_df = df[mask]
 
             logger.info(f"Filtrado aplicado: {len(df)} -> {len(filtered_df)} filas")
             return filtered_df
@@ -332,54 +592,271 @@ class ExcelCategoryAnalyzer:
             logger.error(f"Error aplicando filtro de fechas: {e}")
             return df
 
-    def analyze_excel_file(self, file_path: Path) -> Tuple[Counter, int, Dict[str, Counter]]:
+    @staticmethod
+    def resolve_source(source: ExcelSource) -> Tuple[str, Union[Path, BinaryIO]]:
+        """Obtener el nombre visible y el objeto legible de una fuente Excel.
+
+        Args:
+            source: Ruta al archivo, o tupla (nombre, buffer o ruta)
+
+        Returns:
+            Tupla con (nombre del archivo, ruta o buffer a leer)
+        """
+        if isinstance(source, tuple):
+            name, readable = source
+            if isinstance(readable, (str, Path)):
+                readable = Path(readable)
+            return str(name), readable
+
+        if isinstance(source, (str, Path)):
+            path = Path(source)
+            return path.name, path
+
+        return str(getattr(source, 'name', 'archivo_en_memoria')), source
+
+    def read_excel(self, file_source: Union[Path, BinaryIO], file_name: Optional[str] = None,
+                   usecols: Optional[List[int]] = None, nrows: Optional[int] = None) -> pd.DataFrame:
+        """Leer un archivo Excel con el motor más rápido disponible.
+
+        Usa calamine (lector nativo en Rust) si ``python-calamine`` está instalado;
+        en caso contrario recurre a openpyxl para .xlsx y al motor por defecto de pandas para .xls.
+
+        Args:
+            file_source: Ruta al archivo Excel o buffer binario con su contenido
+            file_name: Nombre del archivo, usado para detectar la extensión de buffers
+            usecols: Posiciones de las columnas a leer (todas si es None)
+            nrows: Número máximo de filas de datos a leer (todas si es None)
+
+        Returns:
+            DataFrame con el contenido de la primera hoja
+        """
+        if hasattr(file_source, 'seek'):
+            file_source.seek(0)
+
+        read_kwargs = {'usecols': usecols, 'nrows': nrows}
+
+        if EXCEL_READ_ENGINE:
+            return pd.read_excel(file_source, engine=EXCEL_READ_ENGINE, **read_kwargs)
+
+        suffix = Path(file_name or getattr(file_source, 'name', '')).suffix.lower()
+        if suffix == '.xls':
+            return pd.read_excel(file_source, **read_kwargs)
+
+        # Usar openpyxl como motor para mejor compatibilidad
+        return pd.read_excel(file_source, engine='openpyxl', **read_kwargs)
+
+    def cache_path(self, file_path: Path) -> Path:
+        """Ruta del Parquet en caché para un archivo Excel en disco.
+
+        La clave combina la ruta, la fecha de modificación y el tamaño del archivo (un archivo
+        modificado genera otra entrada), e indica si hay filtro de fechas, porque en ese caso
+        también se leen las columnas de fecha.
+        """
+        resolved = file_path.resolve()
+        stat = resolved.stat()
+        path_hash = hashlib.blake2b(str(resolved).encode('utf-8'), digest_size=8).hexdigest()
+        date_flag = 'f' if (self.start_date or self.end_date) else 'n'
+        return (
+            self.results_dir / self.CACHE_DIRNAME
+            / f"{resolved.stem}_{path_hash}_{date_flag}_{stat.st_mtime_ns}_{stat.st_size}.parquet"
+        )
+
+    @staticmethod
+    def frame_for_cache(df: pd.DataFrame) -> pd.DataFrame:
+        """Copia de ``df`` que Parquet puede guardar, con los valores de columnas ``object`` como texto.
+
+        Excel admite columnas que mezclan números y texto (p. ej. ``12`` junto a nombres de
+        categoría), que Parquet no puede guardar en una sola columna. El análisis trata esos
+        valores como texto (``str``), así que guardarlos convertidos no cambia el resultado.
+        """
+        object_positions = [position for position, dtype in enumerate(df.dtypes) if dtype == object]
+        if not object_positions:
+            return df
+
+        df = df.copy(deep=False)
+        for position in object_positions:
+            values = df.iloc[:, position]
+            df.isetitem(position, values.where(values.isna(), values.astype(str)).astype(object))
+        return df
+
+    @staticmethod
+    def read_cached_frame(cache_path: Path) -> pd.DataFrame:
+        """Leer un Parquet de la caché con los mismos tipos de columna que la lectura del Excel.
+
+        Parquet devuelve como cadenas las columnas que se guardaron desde ``object``; se
+        restauran a ``object`` para que la detección de columnas vea el mismo DataFrame.
+        """
+        df = pd.read_parquet(cache_path)
+        object_columns = {
+            column['name'] for column in pq.read_schema(cache_path).pandas_metadata['columns']
+            if column['numpy_type'] == 'object'
+        }
+        for position, column in enumerate(df.columns):
+            if column in object_columns and df.dtypes.iloc[position] != object:
+                df.isetitem(position, df.iloc[:, position].astype(object))
+        return df
+
+    def read_relevant_columns(self, file_source: Union[Path, BinaryIO], file_name: str) -> pd.DataFrame:
+        """Leer de un archivo Excel solo las columnas que el análisis puede usar.
+
+        Para archivos en disco (con ``use_cache``) la lectura se guarda en Parquet y las
+        siguientes ejecuciones sobre el mismo archivo sin cambios la leen de ahí, evitando
+        volver a interpretar el Excel. La caché es opcional: si no se puede leer o escribir,
+        se usa la lectura normal.
+        """
+        cache_path = None
+        if self.use_cache and isinstance(file_source, Path):
+            try:
+                cache_path = self.cache_path(file_source)
+                if cache_path.is_file():
+                    df = self.read_cached_frame(cache_path)
+                    logger.debug(f"Archivo {file_name}: leído desde caché {cache_path.name}")
+                    return df
+            except Exception as e:
+                logger.debug(f"No se pudo usar la caché de {file_name}: {e}")
+
+        # Leer solo las columnas que el análisis puede usar, según los encabezados
+        header = self.read_excel(file_source, file_name, nrows=0)
+        usecols = self.select_relevant_columns(header)
+        df = self.read_excel(file_source, file_name, usecols=usecols)
+
+        if cache_path is not None:
+            # Escribir a un temporal y renombrar, para no dejar nunca un Parquet a medias
+            tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+            try:
+                cache_path.parent.mkdir(parents=True, exist_ok=True)
+                self.frame_for_cache(df).to_parquet(tmp_path, compression='zstd')
+                os.replace(tmp_path, cache_path)
+                # Descartar las entradas terminadas de versiones anteriores del mismo archivo
+                # (no los .tmp, que pueden ser escrituras en curso de otro proceso)
+                prefix = cache_path.name.rsplit('_', 2)[0]
+                for stale in cache_path.parent.glob(f"{prefix}_*.parquet"):
+                    if stale != cache_path:
+                        stale.unlink(missing_ok=True)
+            except Exception as e:
+                logger.debug(f"No se pudo guardar la caché de {file_name}: {e}")
+                tmp_path.unlink(missing_ok=True)
+
+        return df
+
+    def select_relevant_columns(self, header: pd.DataFrame) -> Optional[List[int]]:
+        """Determinar, a partir de los encabezados, qué columnas necesita el análisis.
+
+        Se conservan (en su orden original) todas las columnas que los métodos ``identify_*``
+        y el análisis detallado podrían elegir por nombre, de modo que el resultado es el
+        mismo que leyendo la hoja completa.
+
+        Args:
+            header: DataFrame sin filas, solo con los encabezados de la hoja
+
+        Returns:
+            Posiciones de las columnas a leer, o None si hace falta leerlas todas (la detección
+            de respaldo de categoría o fecha necesita inspeccionar los valores)
+        """
+        category_positions = self.matching_column_positions(header, self.CATEGORY_TARGETS, self.CATEGORY_KEYWORDS)
+        if not category_positions:
+            return None
+
+        keep = category_positions
+        keep |= self.matching_column_positions(header, self.SPECIFIC_CATEGORY_TARGETS)
+        keep |= self.matching_column_positions(header, self.INSTALLER_TARGETS, self.INSTALLER_KEYWORDS)
+
+        if self.start_date or self.end_date:
+            date_positions = self.matching_column_positions(header, (), self.DATE_KEYWORDS, self.DATE_COLUMN_NAMES)
+            if not date_positions:
+                return None
+            keep |= date_positions
+
+        return sorted(keep)
+
+    def matching_column_positions(self, df: pd.DataFrame, targets: Tuple[Tuple[str, str], ...],
+                                  keywords: List[str] = (), exact_names: List[str] = ()) -> set:
+        """Posiciones de las columnas que coinciden por nombre con algún objetivo o palabra clave.
+
+        Los objetivos se comparan como en ``find_matching_columns``; las palabras clave, por
+        inclusión en el nombre normalizado, y ``exact_names``, contra el nombre en minúsculas.
+        """
+        positions = set()
+        for position, column in enumerate(df.columns):
+            norm_column = self.normalize_column_name(column)
+            if (
+                (norm_column and any(norm_target in norm_column or norm_column in norm_target for _, norm_target in targets))
+                or any(keyword in norm_column for keyword in keywords)
+                or str(column).lower() in exact_names
+            ):
+                positions.add(position)
+        return positions
+
+    def convert_text_columns(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Pasar a cadenas respaldadas por Arrow las columnas ``object`` de categorías y agentes.
+
+        Reduce memoria y acelera las operaciones ``.str`` posteriores. Sin ``pyarrow`` (o si
+        pandas ya las leyó como cadenas Arrow) el DataFrame queda igual.
+        """
+        if not ARROW_STRING_DTYPE:
+            return df
+
+        positions = self.matching_column_positions(
+            df,
+            self.CATEGORY_TARGETS + self.SPECIFIC_CATEGORY_TARGETS + self.INSTALLER_TARGETS,
+            self.CATEGORY_KEYWORDS + self.INSTALLER_KEYWORDS
+        )
+        for position in sorted(positions):
+            if df.iloc[:, position].dtype == object:
+                df.isetitem(position, df.iloc[:, position].astype(ARROW_STRING_DTYPE))
+        return df
+
+    def analyze_excel_file(self, source: ExcelSource) -> Tuple[Counter, int, Dict[str, Counter]]:
         """Analizar un archivo Excel y extraer frecuencias de categorías.
 
         Args:
-            file_path: Ruta al archivo Excel
+            source: Ruta al archivo Excel, o tupla (nombre, buffer) para archivos en memoria
 
         Returns:
             Tupla con (contador de categorías generales, número total de filas procesadas, diccionario con análisis detallado)
         """
+        file_name, file_source = self.resolve_source(source)
+
         try:
-            logger.info(f"Procesando archivo: {file_path.name}")
+            logger.info(f"Procesando archivo: {file_name}")
 
-            # Leer el archivo Excel
-            # Usar openpyxl como motor para mejor compatibilidad
-            df = pd.read_excel(file_path, engine='openpyxl')
+            df = self.read_relevant_columns(file_source, file_name)
 
             if df.empty:
-                logger.warning(f"El archivo {file_path.name} está vacío")
+                logger.warning(f"El archivo {file_name} está vacío")
                 return Counter(), 0, {}
 
-            logger.info(f"Archivo {file_path.name}: {len(df)} filas, {len(df.columns)} columnas")
+            logger.info(f"Archivo {file_name}: {len(df)} filas, {len(df.columns)} columnas")
 
             # Aplicar filtro de fechas si está configurado
             df = self.filter_by_date_range(df)
 
             if df.empty:
-                logger.warning(f"El archivo {file_path.name} no tiene datos en el rango de fechas especificado")
+                logger.warning(f"El archivo {file_name} no tiene datos en el rango de fechas especificado")
                 return Counter(), 0, {}
 
             # Identificar columna de categoría general
             category_column = self.identify_category_column(df)
 
             if category_column is None:
-                logger.warning(f"No se pudo identificar columna de categoría en {file_path.name}")
+                logger.warning(f"No se pudo identificar columna de categoría en {file_name}")
                 return Counter(), len(df), {}
 
+            # Cadenas Arrow para las columnas de texto que se van a contar y combinar
+            df = self.convert_text_columns(df)
+
             # Extraer categorías generales (ignorar valores nulos)
             categories_raw = df[category_column].dropna()
 
             # NO expandir categorías - contar tal cual
             if categories_raw.empty:
-                logger.warning(f"No se encontraron categorías válidas en {file_path.name}")
+                logger.warning(f"No se encontraron categorías válidas en {file_name}")
                 return Counter(), len(df), {}
 
             # Contar frecuencias de categorías generales sin expandir
-            category_counts = Counter(categories_raw.astype(str).str.strip())
+            category_counts = self.count_values(categories_raw)
 
-            logger.info(f"Archivo {file_path.name}: {len(category_counts)} categorías únicas encontradas ({len(categories_raw)} filas procesadas)")
+            logger.info(f"Archivo {file_name}: {len(category_counts)} categorías únicas encontradas ({len(categories_raw)} filas procesadas)")
 
             # Análisis detallado de columnas específicas
             detailed_analysis = self.analyze_detailed_categories(df)
@@ -387,7 +864,7 @@ class ExcelCategoryAnalyzer:
             return category_counts, len(df), detailed_analysis
 
         except Exception as e:
-            logger.error(f"Error procesando {file_path.name}: {e}")
+            logger.error(f"Error procesando {file_name}: {e}")
             return Counter(), 0, {}
 
     def analyze_detailed_categories(self, df: pd.DataFrame) -> Dict[str, Counter]:
@@ -402,8 +879,8 @@ class ExcelCategoryAnalyzer:
         detailed_analysis = {}
         processed_columns = set()
 
-        for col in self.SPECIFIC_CATEGORY_COLUMNS:
-            matches = self.find_matching_columns(df, col)
+        for col, norm_col in self.SPECIFIC_CATEGORY_TARGETS:
+            matches = self.find_matching_columns(df, col, norm_col)
 
             for match in matches:
                 if match in processed_columns:
@@ -417,7 +894,7 @@ class ExcelCategoryAnalyzer:
 
                 # NO expandir subcategorías - contar tal cual
                 processed_columns.add(match)
-                detailed_analysis[match] = Counter(values_raw.astype(str).str.strip())
+                detailed_analysis[match] = self.count_values(values_raw)
                 logger.info(
                     f"Columna '{match}': {len(detailed_analysis[match])} valores únicos ({len(values_raw)} filas procesadas)"
                 )
@@ -437,13 +914,14 @@ class ExcelCategoryAnalyzer:
 
         return detailed_analysis
 
-    def analyze_combined_categories(self, df: pd.DataFrame) -> Tuple[Counter, List[Dict[str, str]]]:
+    def analyze_combined_categories(self, df: pd.DataFrame) -> Tuple[Counter, Dict[str, List[str]]]:
         """Analizar combinaciones de categoria_general + categoria_especifica + subtipo.
         
         Cada fila del DataFrame se cuenta como UNA llamada única, sin expandir valores con delimitadores.
+        El detalle se devuelve por columnas (``COMBINED_DETAIL_COLUMNS`` -> lista de valores).
         """
         combined_counts = Counter()
-        combined_details = []
+        combined_details = {}
 
         # Buscar columnas de categoría general y específica
         categoria_general = None
@@ -489,139 +967,217 @@ class ExcelCategoryAnalyzer:
             # Elimina duplicados y vacíos
             return [r for r in result if r]
 
-        for idx, row in df.iterrows():
-            if pd.isna(row[categoria_general]):
-                continue
+        df_valid = df[df[categoria_general].notna()]
+        if df_valid.empty:
+            return combined_counts, combined_details
 
-            categoria_gen_raw = str(row[categoria_general]).strip()
-            categoria_especifica_raw = ''
-            subtipo_raw = ''
-            if categoria_especifica_cols:
-                for cat_col in categoria_especifica_cols:
-                    if not pd.isna(row[cat_col]):
-                        categoria_especifica_raw = str(row[cat_col]).strip()
-                        break
-            if subtipo_cols:
-                for subtipo_col in subtipo_cols:
-                    if not pd.isna(row[subtipo_col]):
-                        subtipo_raw = str(row[subtipo_col]).strip()
-                        break
-
-            installer_value = "Sin asignar"
-            if installer_column and installer_column in df.columns:
-                raw_installer = row.get(installer_column)
-                if pd.isna(raw_installer) or str(raw_installer).strip() == "":
-                    installer_value = "Sin asignar"
-                else:
-                    installer_value = str(raw_installer).strip()
-
-            # Separar cada campo por comas (usando excepciones)
-            categoria_gen_list = split_with_exceptions(categoria_gen_raw, excepciones_coma)
-            categoria_especifica_list = split_with_exceptions(categoria_especifica_raw, excepciones_coma)
-            subtipo_list = split_with_exceptions(subtipo_raw, excepciones_coma)
-
-            # Si alguna lista está vacía, poner un string vacío
-            if not categoria_gen_list:
-                categoria_gen_list = ['']
-            if not categoria_especifica_list:
-                categoria_especifica_list = ['']
-            if not subtipo_list:
-                subtipo_list = ['']
-
-            # Calcular la longitud máxima
-            max_len = max(len(categoria_gen_list), len(categoria_especifica_list), len(subtipo_list))
-
-            # Si alguna lista es más corta, repetir el último valor para igualar la longitud
+        def first_non_null(columns):
+            # Primer valor no nulo de las columnas dadas (como texto sin espacios), o '' si no hay
+            result = pd.Series('', index=df_valid.index, dtype=object)
+            if columns:
+                values = df_valid[columns[0]]
+                for col in columns[1:]:
+                    values = values.where(values.notna(), df_valid[col])
+                present = values.notna()
+                result[present] = self.strip_text(values[present])
+            return result
+
+        categoria_gen = self.strip_text(df_valid[categoria_general])
+        categoria_esp = first_non_null(categoria_especifica_cols)
+        subtipo = first_non_null(subtipo_cols)
+
+        installer = pd.Series("Sin asignar", index=df_valid.index, dtype=object)
+        if installer_column and installer_column in df.columns:
+            raw_installer = df_valid[installer_column]
+            installer_str = self.strip_text(raw_installer)
+            assigned = raw_installer.notna() & (installer_str != "")
+            installer[assigned] = installer_str[assigned]
+
+        # Solo las filas con comas necesitan separarse; el resto produce exactamente una ruta
+        has_comma = (
+            categoria_gen.str.contains(',', regex=False)
+            | categoria_esp.str.contains(',', regex=False)
+            | subtipo.str.contains(',', regex=False)
+        ).to_numpy()
+        positions = np.arange(len(df_valid))
+
+        parts = [pd.DataFrame({
+            'categoria_general': categoria_gen.to_numpy()[~has_comma],
+            'categoria_especifica': categoria_esp.to_numpy()[~has_comma],
+            'subtipo': subtipo.to_numpy()[~has_comma],
+            'agente_instalador': installer.to_numpy()[~has_comma],
+            'posicion': positions[~has_comma]
+        })]
+
+        if has_comma.any():
             def extend_list(lst, n):
+                # Si alguna lista es más corta, repetir el último valor para igualar la longitud
                 if len(lst) < n:
                     return lst + [lst[-1]] * (n - len(lst))
                 return lst
-            categoria_gen_list = extend_list(categoria_gen_list, max_len)
-            categoria_especifica_list = extend_list(categoria_especifica_list, max_len)
-            subtipo_list = extend_list(subtipo_list, max_len)
-
-            for gen, esp, sub in zip(categoria_gen_list, categoria_especifica_list, subtipo_list):
-                combined_parts = [gen]
-                if esp:
-                    combined_parts.append(esp)
-                if sub:
-                    combined_parts.append(sub)
-                if len(combined_parts) > 1:
-                    combined_category = " | ".join(combined_parts)
-                    combined_counts[combined_category] += 1
-                    combined_details.append({
-                        'categoria_general': gen,
-                        'categoria_especifica': esp,
-                        'subtipo': sub,
-                        'ruta_completa': combined_category,
-                        'agente_instalador': installer_value
-                    })
+
+            split_rows = []
+            for pos, gen_raw, esp_raw, sub_raw, installer_value in zip(
+                positions[has_comma],
+                categoria_gen.to_numpy()[has_comma],
+                categoria_esp.to_numpy()[has_comma],
+                subtipo.to_numpy()[has_comma],
+                installer.to_numpy()[has_comma]
+            ):
+                # Separar cada campo por comas (usando excepciones); listas vacías pasan a ['']
+                gen_list = split_with_exceptions(gen_raw, excepciones_coma) or ['']
+                esp_list = split_with_exceptions(esp_raw, excepciones_coma) or ['']
+                sub_list = split_with_exceptions(sub_raw, excepciones_coma) or ['']
+
+                max_len = max(len(gen_list), len(esp_list), len(sub_list))
+                for gen, esp, sub in zip(extend_list(gen_list, max_len), extend_list(esp_list, max_len), extend_list(sub_list, max_len)):
+                    split_rows.append((gen, esp, sub, installer_value, pos))
+
+            parts.append(pd.DataFrame(
+                split_rows,
+                columns=['categoria_general', 'categoria_especifica', 'subtipo', 'agente_instalador', 'posicion']
+            ))
+
+        # Reunir ambas partes respetando el orden original de las filas
+        combined = pd.concat(parts, ignore_index=True)
+        combined = combined.sort_values('posicion', kind='stable', ignore_index=True)
+
+        # Solo cuentan las rutas con categoría específica o subtipo
+        has_esp = combined['categoria_especifica'] != ''
+        has_sub = combined['subtipo'] != ''
+        combined = combined[(has_esp | has_sub).to_numpy()]
+        if combined.empty:
+            return combined_counts, combined_details
+        has_esp, has_sub = has_esp[combined.index], has_sub[combined.index]
+
+        # Ruta completa con concatenación vectorizada (+) y where sobre las cadenas: en pandas
+        # con cadenas Arrow resulta varias veces más rápida que Series.str.cat(sep=...) + np.where
+        combined['ruta_completa'] = (
+            combined['categoria_general']
+            + (' | ' + combined['categoria_especifica']).where(has_esp, '')
+            + (' | ' + combined['subtipo']).where(has_sub, '')
+        )
+
+        combined_counts = self.counts_to_counter(combined['ruta_completa'])
+        # Una lista por columna: evita crear un diccionario por fila y el DataFrame se reconstruye directamente
+        combined_details = {col: combined[col].tolist() for col in self.COMBINED_DETAIL_COLUMNS}
 
         return combined_counts, combined_details
 
-    def analyze_multiple_files(self, file_paths: List[Path]) -> Tuple[Counter, int, Dict[str, Counter]]:
+    def analyze_files_in_parallel(self, file_paths: List[ExcelSource]) -> List[Tuple[Counter, int, Dict[str, Counter]]]:
+        """Analizar varios archivos en paralelo, devolviendo los resultados en el mismo orden.
+
+        Si todas las fuentes son rutas en disco y su tamaño total compensa el arranque de los
+        procesos, se usa un pool de procesos (el análisis es mayormente CPU en Python y así no
+        compite por el GIL). Los buffers en memoria no siempre se pueden enviar a otro proceso,
+        por lo que en ese caso, o con archivos pequeños, se usan hilos.
+        """
+        workers = min(len(file_paths), self.max_workers or os.cpu_count() or 1)
+        if workers <= 1:
+            return [self.analyze_excel_file(file_path) for file_path in file_paths]
+
+        readables = [self.resolve_source(source)[1] for source in file_paths]
+
+        if (
+            all(isinstance(readable, Path) and readable.is_file() for readable in readables)
+            and sum(readable.stat().st_size for readable in readables) >= self.PROCESS_POOL_MIN_BYTES
+        ):
+            try:
+                # 'spawn' evita heredar hilos y bloqueos del proceso anfitrión (p. ej. Streamlit)
+                with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+                    return list(executor.map(self.analyze_excel_file, file_paths))
+            except (OSError, BrokenProcessPool) as e:
+                logger.warning(f"No se pudo usar un pool de procesos ({e}); se analizará con hilos")
+
+        with ThreadPoolExecutor(max_workers=min(8, workers)) as executor:
+            return list(executor.map(self.analyze_excel_file, file_paths))
+
+    def analyze_multiple_files(self, file_paths: Iterable[ExcelSource]) -> Tuple[Counter, int, Dict[str, Counter]]:
         """Analizar múltiples archivos Excel y combinar resultados.
 
         Args:
-            file_paths: Lista de rutas a archivos Excel
+            file_paths: Rutas a archivos Excel, o tuplas (nombre, buffer) para archivos en memoria
 
         Returns:
             Tupla con (contador combinado de categorías, número total de filas procesadas, análisis detallado combinado)
         """
-        total_counter = Counter()
+        # Los conteos se acumulan en dict simples y se envuelven en Counter al final:
+        # Counter.update con otro contador suma clave a clave con más sobrecarga por llamada
+        total_counter = {}
         total_detailed_analysis = {}
+        counter_keys = set()
         total_rows = 0
+        file_paths = list(file_paths)
+
+        # Los archivos son independientes: analizarlos en paralelo y combinar en orden
+        if len(file_paths) > 1:
+            file_results = self.analyze_files_in_parallel(file_paths)
+        else:
+            file_results = [self.analyze_excel_file(file_path) for file_path in file_paths]
 
-        for file_path in file_paths:
-            file_counter, file_rows, file_detailed = self.analyze_excel_file(file_path)
-            total_counter.update(file_counter)
+        for file_counter, file_rows, file_detailed in file_results:
+            self.add_counts(total_counter, file_counter)
             total_rows += file_rows
 
-            # Combinar análisis detallado contemplando contadores y listas
+            # Combinar análisis detallado contemplando contadores, listas y diccionarios de listas
             for key, value in file_detailed.items():
                 if isinstance(value, Counter):
-                    if key not in total_detailed_analysis:
-                        total_detailed_analysis[key] = Counter()
-                    total_detailed_analysis[key].update(value)
+                    counter_keys.add(key)
+                    self.add_counts(total_detailed_analysis.setdefault(key, {}), value)
+                elif isinstance(value, dict):
+                    columns = total_detailed_analysis.setdefault(key, {})
+                    for col, col_values in value.items():
+                        columns.setdefault(col, []).extend(col_values)
                 elif isinstance(value, list):
                     if key not in total_detailed_analysis:
                         total_detailed_analysis[key] = []
                     total_detailed_analysis[key].extend(value)
 
-        return total_counter, total_rows, total_detailed_analysis
+        for key in counter_keys:
+            total_detailed_analysis[key] = Counter(total_detailed_analysis[key])
+
+        return Counter(total_counter), total_rows, total_detailed_analysis
+
+    @staticmethod
+    def add_counts(totals: Dict[str, int], counts: Counter):
+        """Sumar ``counts`` sobre el diccionario ``totals`` (en el orden de sus claves)."""
+        get = totals.get
+        for key, count in counts.items():
+            totals[key] = get(key, 0) + count
 
-    def generate_installer_breakdown(self, combined_details: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    def generate_installer_breakdown(self, combined_details: Dict[str, List[str]]) -> Dict[str, list]:
         """Generar desglose de categorías por agente instalador."""
 
         if not combined_details:
-            return []
+            return {}
 
-        df_details = pd.DataFrame(combined_details)
+        df_details = self.detail_frame(combined_details)
 
         if df_details.empty or 'agente_instalador' not in df_details.columns:
-            return []
+            return {}
 
-        df_details['agente_instalador'] = df_details['agente_instalador'].fillna('Sin asignar')
-
-        # Filtrar para excluir "Sin asignar"
-        df_details = df_details[df_details['agente_instalador'] != 'Sin asignar']
+        # Filtrar para excluir "Sin asignar" (los valores nulos cuentan como sin asignar)
+        installers = df_details['agente_instalador']
+        df_details = df_details[installers.notna() & (installers != 'Sin asignar')]
 
         if df_details.empty:
-            return []
+            return {}
 
-        # Agrupar por agente y ruta
+        # Agrupar por agente y ruta. Se usa groupby(observed=True) y no DataFrame.value_counts:
+        # con columnas categóricas value_counts cuenta también las combinaciones no observadas
+        # (producto cartesiano de las categorías) y resulta órdenes de magnitud más lento
         grouped = (
             df_details
-            .groupby(['agente_instalador', 'categoria_general', 'categoria_especifica', 'subtipo', 'ruta_completa'])
+            .groupby(['agente_instalador', 'categoria_general', 'categoria_especifica', 'subtipo', 'ruta_completa'], observed=True)
             .size()
             .reset_index(name='Frecuencia')
         )
 
         if grouped.empty:
-            return []
+            return {}
 
         # Calcular totales por agente para porcentajes
-        grouped['Total_Agente'] = grouped.groupby('agente_instalador')['Frecuencia'].transform('sum')
+        grouped['Total_Agente'] = grouped.groupby('agente_instalador', observed=True)['Frecuencia'].transform('sum')
         grouped['Porcentaje_Agente'] = grouped['Frecuencia'] / grouped['Total_Agente'] * 100
 
         # Ordenar por agente y frecuencia
@@ -629,7 +1185,8 @@ class ExcelCategoryAnalyzer:
 
         grouped['Frecuencia'] = grouped['Frecuencia'].astype(int)
 
-        return grouped[['agente_instalador', 'categoria_general', 'categoria_especifica', 'subtipo', 'ruta_completa', 'Frecuencia', 'Porcentaje_Agente']].to_dict('records')
+        # Por columnas, como el detalle combinado: se reconstruye como DataFrame sin inferir registro a registro
+        return {col: grouped[col].tolist() for col in self.INSTALLER_DETAIL_COLUMNS}
 
     def get_top_categories(self, counter: Counter, top_n: int = 50) -> List[Tuple[str, int]]:
         """Obtener las top N categorías más frecuentes.
@@ -668,8 +1225,8 @@ class ExcelCategoryAnalyzer:
         report.append(f"Categorías generales únicas encontradas: {total_categories:,}")
 
         if all_categories:
-            # Estadísticas adicionales
-            total_top_50 = sum(count for _, count in all_categories[:50]) if len(all_categories) >= 50 else sum(count for _, count in all_categories)
+            # Estadísticas adicionales (el top 50 sale de la misma lista ya ordenada)
+            total_top_50 = sum(count for _, count in all_categories[:50])
             coverage = (total_top_50 / total_rows * 100) if total_rows > 0 else 0
 
             report.append(f"Cobertura de top 50 categorías generales: {coverage:.1f}%")
@@ -695,7 +1252,8 @@ class ExcelCategoryAnalyzer:
             report.append("=" * 100)
 
             for column_name, column_counter in detailed_analysis.items():
-                if column_counter:
+                # Los detalles por fila (rutas, agentes) no son contadores y se omiten aquí
+                if isinstance(column_counter, Counter) and column_counter:
                     report.append(f"\n🔍 ANÁLISIS DE '{column_name.upper()}':")
                     report.append(f"Valores únicos encontrados: {len(column_counter)}")
                     report.append("-" * 60)
@@ -713,6 +1271,118 @@ class ExcelCategoryAnalyzer:
         report.append("=" * 100)
         return "\n".join(report)
 
+    @staticmethod
+    def open_excel_writer(target: Union[str, Path, BinaryIO]) -> pd.ExcelWriter:
+        """Abrir un ExcelWriter, con xlsxwriter en modo ``constant_memory`` si está disponible.
+
+        En ese modo cada fila se vuelca al disco en cuanto se pasa a la siguiente, por lo que
+        las hojas deben escribirse de arriba hacia abajo (ver ``write_frame``). Los textos se
+        escriben siempre como texto: sin convertirlos en fórmulas ni en hipervínculos.
+        """
+        if EXCEL_WRITE_ENGINE == 'xlsxwriter':
+            options = {'constant_memory': True, 'strings_to_formulas': False, 'strings_to_urls': False}
+            return pd.ExcelWriter(target, engine='xlsxwriter', engine_kwargs={'options': options})
+        return pd.ExcelWriter(target, engine='openpyxl')
+
+    @classmethod
+    def write_frame(cls, writer: pd.ExcelWriter, sheet_name: str, df: pd.DataFrame, startrow: int = 0, header: bool = True,
+                    header_format=None):
+        """Escribir un DataFrame fila por fila a partir de ``startrow`` (sin índice).
+
+        ``DataFrame.to_excel`` escribe por columnas, lo que no es compatible con el modo
+        ``constant_memory`` de xlsxwriter; con otros motores se delega en ``to_excel``.
+        ``header_format`` permite reutilizar un formato de encabezado ya creado en el libro.
+        Los valores se pasan a Python por bloques de ``EXCEL_WRITE_CHUNK_ROWS`` filas, de modo
+        que la memoria extra no crece con el tamaño de la hoja.
+        """
+        if writer.engine != 'xlsxwriter':
+            df.to_excel(writer, sheet_name=sheet_name, startrow=startrow, index=False, header=header)
+            return
+
+        worksheet = writer.sheets.get(sheet_name) or writer.book.add_worksheet(sheet_name)
+        row = startrow
+        if header:
+            if header_format is None:
+                header_format = writer.book.add_format(HEADER_FORMAT)
+            worksheet.write_row(row, 0, [str(col) for col in df.columns], header_format)
+            row += 1
+
+        # Nulos de todas las celdas, calculados una sola vez en lugar de comprobar cada una con pd.isna
+        present = df.notna().to_numpy(copy=True)
+
+        # Método de escritura por columna según su tipo: evita que ``write`` deduzca el tipo
+        # de cada celda. Las columnas object (tipos mezclados) siguen pasando por ``write``
+        cell_writers = []
+        for position, dtype in enumerate(df.dtypes):
+            if dtype != object and pd.api.types.is_string_dtype(dtype):
+                # Como ``write``, las cadenas vacías quedan como celdas en blanco
+                present[:, position] &= (df.iloc[:, position] != '').to_numpy(dtype=bool, na_value=False)
+                cell_writers.append(worksheet.write_string)
+            elif dtype.kind in 'iuf':
+                cell_writers.append(worksheet.write_number)
+            else:
+                cell_writers.append(worksheet.write)
+
+        for start in range(0, len(df), cls.EXCEL_WRITE_CHUNK_ROWS):
+            stop = start + cls.EXCEL_WRITE_CHUNK_ROWS
+            # Valores del bloque como escalares de Python, por columna
+            columns = [df.iloc[start:stop, position].tolist() for position in range(df.shape[1])]
+
+            for values, row_present in zip(zip(*columns), present[start:stop].tolist()):
+                for col, (value, is_present, write_cell) in enumerate(zip(values, row_present, cell_writers)):
+                    if is_present:
+                        write_cell(row, col, value)
+                row += 1
+
+    def write_sections(self, writer: pd.ExcelWriter, sheet_name: str, sections: List[Tuple[str, Optional[pd.DataFrame]]]):
+        """Escribir en una hoja varias secciones (título y tabla) separadas por filas en blanco.
+
+        Todas las secciones se escriben en una sola pasada: con xlsxwriter, fila a fila de arriba
+        abajo y con un único formato de encabezado; con openpyxl, reuniendo sus filas y
+        añadiéndolas a la hoja con ``append`` (los encabezados se formatean después).
+        """
+        if writer.engine == 'xlsxwriter':
+            header_format = writer.book.add_format(HEADER_FORMAT)
+            worksheet = writer.sheets.get(sheet_name) or writer.book.add_worksheet(sheet_name)
+            current_row = 0
+            for section_name, section_df in sections:
+                # El título va directo a su celda, sin un DataFrame de 1x1
+                worksheet.write_string(current_row, 0, section_name)
+                if section_df is not None:
+                    self.write_frame(writer, sheet_name, section_df, startrow=current_row + 2, header_format=header_format)
+                current_row += (len(section_df) if section_df is not None else 1) + 4  # Espacio entre secciones
+            return
+
+        # Título, fila en blanco, encabezado + datos y una fila en blanco (o cuatro si no hay datos)
+        rows = []
+        header_rows = []
+        for section_name, section_df in sections:
+            rows.extend([[section_name], []])
+            if section_df is not None:
+                header_rows.append((len(rows), section_df.shape[1]))
+                rows.append([str(col) for col in section_df.columns])
+                rows.extend(section_df.astype(object).where(section_df.notna(), None).values.tolist())
+                rows.append([])
+            else:
+                rows.extend([[]] * 3)
+
+        while rows and not rows[-1]:
+            rows.pop()
+
+        # Filas añadidas directamente a la hoja de openpyxl, sin pasar por DataFrame ni to_excel
+        from openpyxl.styles import Alignment, Border, Font, Side
+        worksheet = writer.book.create_sheet(sheet_name)
+        for row in rows:
+            worksheet.append(row)
+
+        thin = Side(style='thin')
+        for row, n_columns in header_rows:
+            for col in range(1, n_columns + 1):
+                cell = worksheet.cell(row=row + 1, column=col)
+                cell.font = Font(bold=True)
+                cell.border = Border(left=thin, right=thin, top=thin, bottom=thin)
+                cell.alignment = Alignment(horizontal='center', vertical='top')
+
     def save_excel_report(self, filename: str, counter: Counter, total_rows: int, files_processed: int, detailed_analysis: Dict[str, Counter]):
         """Guardar reporte ejecutivo en formato Excel con análisis de negocio.
 
@@ -724,7 +1394,7 @@ class ExcelCategoryAnalyzer:
             detailed_analysis: Diccionario con análisis detallado de columnas específicas
         """
         try:
-            with pd.ExcelWriter(filename, engine='openpyxl') as writer:
+            with self.open_excel_writer(filename) as writer:
                 # Crear análisis ejecutivo completo
                 self.create_executive_dashboard(writer, counter, total_rows, files_processed, detailed_analysis)
 
@@ -734,64 +1404,20 @@ class ExcelCategoryAnalyzer:
             logger.error(f"Error creando archivo Excel ejecutivo: {e}")
             raise
 
-    def create_executive_dashboard(self, writer, counter: Counter, total_rows: int, files_processed: int, detailed_analysis: Dict[str, Counter]):
-        """Crear dashboard ejecutivo con métricas de negocio.
+    def generate_executive_summary(self, counter: Counter, total_rows: int, files_processed: int, detailed_analysis: Dict[str, Counter],
+                                   ranked: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> pd.DataFrame:
+        """Generar resumen ejecutivo con métricas clave de negocio.
 
-        Args:
-            writer: ExcelWriter object
-            counter: Contador de categorías
-            total_rows: Total de llamadas
-            files_processed: Número de archivos
-            detailed_analysis: Análisis detallado
+        ``ranked`` es, si ya se calculó, ``rank_counts(counter)``; así no se vuelve a ordenar.
         """
 
-        # 1. RESUMEN EJECUTIVO (Sección superior)
-        executive_summary = self.generate_executive_summary(counter, total_rows, files_processed, detailed_analysis)
-
-        # Generar DataFrame de rutas completas
-        combined_detail = detailed_analysis.get('categoria_combinada_detalle') if detailed_analysis else None
-        routes_df = None
-        if combined_detail:
-            df_routes = pd.DataFrame(combined_detail)
-            route_counts = df_routes['ruta_completa'].value_counts().reset_index()
-            route_counts.columns = ['ruta_completa', 'Frecuencia']
-            route_counts['% del Total'] = route_counts['Frecuencia'] / total_rows * 100 if total_rows > 0 else 0
-            routes_df = route_counts.merge(
-                df_routes.drop_duplicates('ruta_completa')[['ruta_completa', 'categoria_general', 'categoria_especifica', 'subtipo']],
-                on='ruta_completa',
-                how='left'
-            )
-            routes_df['% del Total'] = routes_df['% del Total'].apply(lambda x: f"{x:.2f}%")
-            routes_df = routes_df[['categoria_general', 'categoria_especifica', 'subtipo', 'ruta_completa', 'Frecuencia', '% del Total']]
-
-        # Crear DataFrames para cada sección
-        sections = [
-            ("RESUMEN EJECUTIVO", executive_summary),
-            ("KPIs PRINCIPALES", self.generate_kpi_section(counter, total_rows)),
-            ("RUTAS COMPLETAS DE MOTIVOS", routes_df),
-            ("ANÁLISIS DE SUBCATEGORÍAS", self.generate_subcategory_analysis(detailed_analysis, total_rows))
-        ]
-
-        current_row = 0
-
-        for section_name, section_df in sections:
-            # Agregar título de sección
-            title_df = pd.DataFrame([[section_name]], columns=[''])
-            title_df.to_excel(writer, sheet_name='Dashboard_Ejecutivo', startrow=current_row, index=False, header=False)
-
-            # Agregar contenido de la sección
-            if section_df is not None:
-                section_df.to_excel(writer, sheet_name='Dashboard_Ejecutivo', startrow=current_row + 2, index=False)
-
-            current_row += (len(section_df) if section_df is not None else 1) + 4  # Espacio entre secciones
-
-    def generate_executive_summary(self, counter: Counter, total_rows: int, files_processed: int, detailed_analysis: Dict[str, Counter]) -> pd.DataFrame:
-        """Generar resumen ejecutivo con métricas clave de negocio."""
-
         # Métricas básicas
         total_categories = len(counter)
-        top_3_categories = counter.most_common(3)
-        top_3_total = sum(count for _, count in top_3_categories)
+        if ranked is not None:
+            top_3_total = int(ranked[1][:3].sum())
+        else:
+            # Solo interesan las frecuencias: heapq sobre los valores, sin tuplas (clave, valor)
+            top_3_total = sum(heapq.nlargest(3, counter.values()))
 
         # Calcular concentración
         concentration_percentage = (top_3_total / total_rows * 100) if total_rows > 0 else 0
@@ -828,105 +1454,111 @@ class ExcelCategoryAnalyzer:
 
         return pd.DataFrame(summary_data)
 
-    def generate_kpi_section(self, counter: Counter, total_rows: int) -> pd.DataFrame:
-        """Generar sección de KPIs principales."""
+    def generate_kpi_section(self, counter: Counter, total_rows: int,
+                             ranked: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+                             percentages: Optional[np.ndarray] = None) -> pd.DataFrame:
+        """Generar sección de KPIs principales.
+
+        ``ranked`` es, si ya se calculó, ``rank_counts(counter)``; así no se vuelve a ordenar.
+        ``percentages`` son los porcentajes de esas frecuencias, en el mismo orden.
+        """
 
         # Todas las categorías ordenadas por volumen (no solo top 5)
-        all_categories = counter.most_common()
-
-        kpi_data = []
-        for i, (category, count) in enumerate(all_categories, 1):
-            percentage = (count / total_rows * 100) if total_rows > 0 else 0
-            kpi_data.append({
-                'Ranking': i,
-                'Categoría Principal': category,
-                'Volumen': f'{count:,}',
-                '% del Total': f'{percentage:.1f}%',
-                'Impacto Operativo': self.get_business_impact_category(category, percentage)
-            })
+        categories, counts = ranked if ranked is not None else self.rank_counts(counter)
 
-        return pd.DataFrame(kpi_data)
+        if not len(counts):
+            return pd.DataFrame()
 
-    def generate_distribution_section(self, counter: Counter, total_rows: int) -> pd.DataFrame:
-        """Generar análisis de distribución de llamadas."""
-
-        # Agrupar categorías por nivel de volumen
-        high_volume = []
-        medium_volume = []
-        low_volume = []
-
-        for category, count in counter.items():
-            percentage = (count / total_rows * 100) if total_rows > 0 else 0
-            if percentage >= 10:
-                high_volume.append((category, count, percentage))
-            elif percentage >= 1:
-                medium_volume.append((category, count, percentage))
-            else:
-                low_volume.append((category, count, percentage))
+        if percentages is None:
+            percentages = self.percent_of_total(counts, total_rows)
 
-        distribution_data = []
+        # Nivel de impacto de todas las categorías a la vez
+        impact = self.classify_impact(percentages)
 
-        # Alto volumen
-        distribution_data.append({
-            'Segmento': 'ALTO VOLUMEN (>10%)',
-            'Categorías': len(high_volume),
-            'Llamadas': f'{sum(count for _, count, _ in high_volume):,}',
-            '% Total': f'{sum(perc for _, _, perc in high_volume):.1f}%',
-            'Ejemplos': ', '.join([cat for cat, _, _ in high_volume[:3]])
+        return pd.DataFrame({
+            'Ranking': np.arange(1, len(counts) + 1),
+            'Categoría Principal': categories,
+            'Volumen': list(map('{:,}'.format, counts.tolist())),
+            '% del Total': list(map('{:.1f}%'.format, percentages.tolist())),
+            'Impacto Operativo': impact
         })
 
-        # Medio volumen
-        distribution_data.append({
-            'Segmento': 'MEDIO VOLUMEN (1-10%)',
-            'Categorías': len(medium_volume),
-            'Llamadas': f'{sum(count for _, count, _ in medium_volume):,}',
-            '% Total': f'{sum(perc for _, _, perc in medium_volume):.1f}%',
-            'Ejemplos': ', '.join([cat for cat, _, _ in medium_volume[:3]])
-        })
+    def generate_distribution_section(self, counter: Counter, total_rows: int) -> pd.DataFrame:
+        """Generar análisis de distribución de llamadas."""
 
-        # Bajo volumen
-        distribution_data.append({
-            'Segmento': 'BAJO VOLUMEN (<1%)',
-            'Categorías': len(low_volume),
-            'Llamadas': f'{sum(count for _, count, _ in low_volume):,}',
-            '% Total': f'{sum(perc for _, _, perc in low_volume):.1f}%',
-            'Ejemplos': ', '.join([cat for cat, _, _ in low_volume[:3]])
+        counts = pd.Series(dict(counter), dtype='int64')
+        percentages = pd.Series(self.percent_of_total(counts, total_rows), index=counts.index)
+
+        # Agrupar categorías por nivel de volumen: [0, 1) bajo, [1, 10) medio, [10, ∞) alto
+        frame = pd.DataFrame({
+            'count': counts,
+            'pct': percentages,
+            'segment': pd.cut(percentages, bins=[-np.inf, 1, 10, np.inf], right=False, labels=['BAJO', 'MEDIO', 'ALTO'])
         })
+        by_segment = frame.groupby('segment', observed=False)
+        totals = by_segment.agg(categorias=('count', 'size'), llamadas=('count', 'sum'), porcentaje=('pct', 'sum'))
+        # Ejemplos: las tres primeras categorías de cada segmento, en el orden del contador
+        examples = by_segment.head(3)
+
+        distribution_data = []
+        for segment, title in [('ALTO', 'ALTO VOLUMEN (>10%)'), ('MEDIO', 'MEDIO VOLUMEN (1-10%)'), ('BAJO', 'BAJO VOLUMEN (<1%)')]:
+            distribution_data.append({
+                'Segmento': title,
+                'Categorías': int(totals.at[segment, 'categorias']),
+                'Llamadas': f"{int(totals.at[segment, 'llamadas']):,}",
+                '% Total': f"{totals.at[segment, 'porcentaje']:.1f}%",
+                'Ejemplos': ', '.join(examples.index[examples['segment'] == segment])
+            })
 
         return pd.DataFrame(distribution_data)
 
     def generate_subcategory_analysis(self, detailed_analysis: Dict[str, Counter], total_rows: int) -> pd.DataFrame:
         """Generar análisis de subcategorías más relevantes."""
 
-        subcategory_data = []
+        frames = []
 
         # Analizar principales subcategorías
         priority_columns = ['categoria_especifica', 'subtipo_categoria']
 
         for col_name in priority_columns:
             if col_name in detailed_analysis and detailed_analysis[col_name]:
-                top_5 = detailed_analysis[col_name].most_common(5)
-
-                for subcategory, count in top_5:
-                    percentage = (count / total_rows * 100) if total_rows > 0 else 0
-                    subcategory_data.append({
-                        'Tipo': col_name.replace('_', ' ').title(),
-                        'Subcategoría': subcategory,
-                        'Frecuencia': f'{count:,}',
-                        '% Total': f'{percentage:.1f}%',
-                        'Prioridad': self.get_business_priority(col_name, subcategory, percentage)
-                    })
-
-        return pd.DataFrame(subcategory_data)
-
-    def generate_business_insights(self, counter: Counter, total_rows: int, detailed_analysis: Dict[str, Counter]) -> pd.DataFrame:
-        """Generar insights y recomendaciones de negocio."""
+                # most_common(5) selecciona con un heap sin construir una Series con todo el contador
+                subcategories, counts = zip(*detailed_analysis[col_name].most_common(5))
+                counts = np.asarray(counts, dtype=np.int64)
+                percentages = self.percent_of_total(counts, total_rows)
+
+                frames.append(pd.DataFrame({
+                    'Tipo': col_name.replace('_', ' ').title(),
+                    'Subcategoría': list(subcategories),
+                    'Frecuencia': list(map('{:,}'.format, counts.tolist())),
+                    '% Total': list(map('{:.1f}%'.format, percentages.tolist())),
+                    'Prioridad': self.classify_priority(percentages)
+                }))
+
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+    def generate_business_insights(self, counter: Counter, total_rows: int, detailed_analysis: Dict[str, Counter],
+                                   ranked: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+                                   percentages: Optional[np.ndarray] = None) -> pd.DataFrame:
+        """Generar insights y recomendaciones de negocio.
+
+        ``ranked`` es, si ya se calculó, ``rank_counts(counter)``; así no se vuelve a ordenar.
+        ``percentages`` son los porcentajes de esas frecuencias, en el mismo orden.
+        """
 
         insights_data = []
 
         # Insight 1: Concentración de volumen
-        top_category, top_count = counter.most_common(1)[0]
-        top_percentage = (top_count / total_rows * 100) if total_rows > 0 else 0
+        if ranked is not None:
+            top_category, top_count = ranked[0][0], int(ranked[1][0])
+        else:
+            top_category, top_count = counter.most_common(1)[0]
+        if ranked is not None and percentages is not None:
+            top_percentage = float(percentages[0])
+        else:
+            top_percentage = (top_count / total_rows * 100) if total_rows > 0 else 0
 
         if top_percentage > 30:
             insights_data.append({
@@ -956,25 +1588,40 @@ class ExcelCategoryAnalyzer:
 
         return pd.DataFrame(insights_data)
 
+    @staticmethod
+    def classify_percentages(percentages: np.ndarray, levels: List[Tuple[float, str]], default: str) -> np.ndarray:
+        """Asignar a cada porcentaje la etiqueta del mayor umbral ``(umbral, etiqueta)`` que alcanza.
+
+        Se evalúa sobre el arreglo completo sin recorrer los valores en Python: ``np.searchsorted``
+        da en una sola pasada el código del nivel de cada valor, que luego indexa el arreglo de
+        etiquetas. Los valores que no alcanzan ningún umbral (o NaN) reciben ``default``.
+        """
+        percentages = np.asarray(percentages, dtype=float)
+        ordered = sorted(levels)
+        thresholds = np.array([threshold for threshold, _ in ordered], dtype=float)
+        labels = np.array([default] + [label for _, label in ordered], dtype=object)
+
+        codes = np.searchsorted(thresholds, percentages, side='right')
+        codes[np.isnan(percentages)] = 0
+        return labels[codes]
+
+    @classmethod
+    def classify_impact(cls, percentages: np.ndarray) -> np.ndarray:
+        """Impacto de negocio (``BUSINESS_IMPACT_LEVELS``) de cada porcentaje."""
+        return cls.classify_percentages(percentages, cls.BUSINESS_IMPACT_LEVELS, cls.BUSINESS_IMPACT_DEFAULT)
+
+    @classmethod
+    def classify_priority(cls, percentages: np.ndarray) -> np.ndarray:
+        """Prioridad de negocio (``BUSINESS_PRIORITY_LEVELS``) de cada porcentaje."""
+        return cls.classify_percentages(percentages, cls.BUSINESS_PRIORITY_LEVELS, cls.BUSINESS_PRIORITY_DEFAULT)
+
     def get_business_impact_category(self, category: str, percentage: float) -> str:
-        """Obtener impacto de negocio de una categoría."""
-        if percentage >= 30:
-            return "Crítico - Alto volumen"
-        elif percentage >= 15:
-            return "Importante - Optimización"
-        elif percentage >= 5:
-            return "Moderado - Monitoreo"
-        else:
-            return "Bajo - Especializado"
+        """Obtener impacto de negocio de una categoría (ver ``classify_impact``)."""
+        return str(self.classify_impact([percentage])[0])
 
     def get_business_priority(self, col_name: str, subcategory: str, percentage: float) -> str:
-        """Obtener prioridad de negocio para subcategorías."""
-        if percentage >= 5:
-            return "Alta"
-        elif percentage >= 2:
-            return "Media"
-        else:
-            return "Baja"
+        """Obtener prioridad de negocio para subcategorías (ver ``classify_priority``)."""
+        return str(self.classify_priority([percentage])[0])
 
     def generate_excel_report(self, counter: Counter, total_rows: int, files_processed: int, detailed_analysis: Dict[str, Counter]) -> bytes:
         """Generar reporte ejecutivo en formato Excel en memoria.
@@ -992,7 +1639,7 @@ class ExcelCategoryAnalyzer:
             # Crear buffer en memoria
             buffer = io.BytesIO()
 
-            with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+            with self.open_excel_writer(buffer) as writer:
                 # Crear análisis ejecutivo completo
                 self.create_executive_dashboard(writer, counter, total_rows, files_processed, detailed_analysis)
 
@@ -1007,66 +1654,72 @@ class ExcelCategoryAnalyzer:
             logger.error(f"Error creando archivo Excel en memoria: {e}")
             raise
 
-    def create_executive_dashboard(self, writer, counter: Counter, total_rows: int, files_processed: int, detailed_analysis: Dict[str, Counter]):
-        """Crear dashboard ejecutivo con métricas de negocio.
+    def build_dashboard_sections(self, counter: Counter, total_rows: int, files_processed: int,
+                                 detailed_analysis: Dict[str, Counter]) -> List[Tuple[str, Optional[pd.DataFrame]]]:
+        """Calcular las secciones (título, DataFrame) de la hoja Dashboard_Ejecutivo.
 
         Args:
-            writer: ExcelWriter object
             counter: Contador de categorías
             total_rows: Total de llamadas
             files_processed: Número de archivos
             detailed_analysis: Análisis detallado
+
+        Returns:
+            Lista de tuplas (título de la sección, DataFrame o None si no hay datos)
         """
 
+        # Ordenar las categorías y calcular sus porcentajes una sola vez; las secciones
+        # reutilizan los mismos arreglos
+        ranked = self.rank_counts(counter)
+        percentages = self.percent_of_total(ranked[1], total_rows)
+
         # 1. RESUMEN EJECUTIVO (Sección superior)
-        executive_summary = self.generate_executive_summary(counter, total_rows, files_processed, detailed_analysis)
+        executive_summary = self.generate_executive_summary(counter, total_rows, files_processed, detailed_analysis, ranked)
 
         # Generar DataFrame de rutas completas
         combined_detail = detailed_analysis.get('categoria_combinada_detalle') if detailed_analysis else None
         routes_df = None
         if combined_detail:
-            df_routes = pd.DataFrame(combined_detail)
-            route_counts = df_routes['ruta_completa'].value_counts().reset_index()
-            route_counts.columns = ['ruta_completa', 'Frecuencia']
-            route_counts['% del Total'] = route_counts['Frecuencia'] / total_rows * 100 if total_rows > 0 else 0
-            routes_df = route_counts.merge(
-                df_routes.drop_duplicates('ruta_completa')[['ruta_completa', 'categoria_general', 'categoria_especifica', 'subtipo']],
-                on='ruta_completa',
-                how='left'
-            )
-            routes_df['% del Total'] = routes_df['% del Total'].apply(lambda x: f"{x:.2f}%")
+            routes_df = self.group_routes(combined_detail)
+            route_percentages = self.percent_of_total(routes_df['Frecuencia'], total_rows)
+            routes_df['% del Total'] = list(map('{:.2f}%'.format, route_percentages.tolist()))
             routes_df = routes_df[['categoria_general', 'categoria_especifica', 'subtipo', 'ruta_completa', 'Frecuencia', '% del Total']]
 
         # Crear DataFrames para cada sección
-        sections = [
+        return [
             ("RESUMEN EJECUTIVO", executive_summary),
-            ("KPIs PRINCIPALES", self.generate_kpi_section(counter, total_rows)),
+            ("KPIs PRINCIPALES", self.generate_kpi_section(counter, total_rows, ranked, percentages)),
             ("RUTAS COMPLETAS DE MOTIVOS", routes_df),
             ("ANÁLISIS DE SUBCATEGORÍAS", self.generate_subcategory_analysis(detailed_analysis, total_rows))
         ]
 
-        current_row = 0
-
-        for section_name, section_df in sections:
-            # Agregar título de sección
-            title_df = pd.DataFrame([[section_name]], columns=[''])
-            title_df.to_excel(writer, sheet_name='Dashboard_Ejecutivo', startrow=current_row, index=False, header=False)
-
-            # Agregar contenido de la sección
-            if section_df is not None:
-                section_df.to_excel(writer, sheet_name='Dashboard_Ejecutivo', startrow=current_row + 2, index=False)
+    def create_executive_dashboard(self, writer, counter: Counter, total_rows: int, files_processed: int, detailed_analysis: Dict[str, Counter]):
+        """Crear dashboard ejecutivo con métricas de negocio.
 
-            current_row += (len(section_df) if section_df is not None else 1) + 4  # Espacio entre secciones
+        Args:
+            writer: ExcelWriter object
+            counter: Contador de categorías
+            total_rows: Total de llamadas
+            files_processed: Número de archivos
+            detailed_analysis: Análisis detallado
+        """
+        sections = self.build_dashboard_sections(counter, total_rows, files_processed, detailed_analysis)
+        self.write_sections(writer, 'Dashboard_Ejecutivo', sections)
 
         # Añadir hoja separada para el análisis por agente instalador
         installer_detail = detailed_analysis.get('agente_instalador_detalle') if detailed_analysis else None
-        if installer_detail:
-            df_installers = pd.DataFrame(installer_detail)
-            if not df_installers.empty:
-                df_installers['% del Agente'] = df_installers['Porcentaje_Agente'].apply(lambda x: f"{x:.2f}%" if isinstance(x, (int, float)) else x)
-                df_installers_export = df_installers[['agente_instalador', 'categoria_general', 'categoria_especifica', 
-                                                       'subtipo', 'ruta_completa', 'Frecuencia', '% del Agente']]
-                df_installers_export.to_excel(writer, sheet_name='Agentes_Instaladores', index=False)
+        # El detalle es un diccionario de listas por columna, aunque también se acepta ya como DataFrame
+        if installer_detail is not None and len(installer_detail):
+            # Solo las columnas que se exportan, sin construir antes el DataFrame completo
+            df_installers_export = pd.DataFrame({
+                col: installer_detail[col]
+                for col in ('agente_instalador', 'categoria_general', 'categoria_especifica', 'subtipo', 'ruta_completa', 'Frecuencia')
+            })
+            if not df_installers_export.empty:
+                # Los porcentajes se fuerzan a numéricos una vez y se formatean sin lambda por fila
+                percentages = pd.to_numeric(np.asarray(installer_detail['Porcentaje_Agente']), errors='coerce')
+                df_installers_export['% del Agente'] = list(map('{:.2f}%'.format, np.where(np.isnan(percentages), 0, percentages).tolist()))
+                self.write_frame(writer, 'Agentes_Instaladores', df_installers_export)
                 logger.info(f"Añadida hoja 'Agentes_Instaladores' con {len(df_installers_export)} registros")
 
 def main():
@@ -1137,6 +1790,18 @@ NOTA: Especializado en análisis ejecutivo con métricas de negocio, insights y
         help="Fecha de fin para filtrar datos (formato: YYYY-MM-DD)"
     )
 
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Número máximo de archivos a analizar en paralelo (por defecto: según los núcleos; 1 = secuencial)"
+    )
+
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="No usar ni guardar la caché Parquet de los archivos leídos (results_dir/.cache)"
+    )
+
     parser.add_argument(
         "--verbose", "-v",
         action="store_true",
@@ -1176,7 +1841,12 @@ NOTA: Especializado en análisis ejecutivo con métricas de negocio, insights y
             return 1
 
         # Inicializar analizador
-        analyzer = ExcelCategoryAnalyzer(args.results_dir, start_date, end_date)
+        if args.workers is not None and args.workers < 1:
+            logger.error("--workers debe ser un entero mayor o igual a 1")
+            return 1
+
+        analyzer = ExcelCategoryAnalyzer(args.results_dir, start_date, end_date,
+                                         use_cache=not args.no_cache, max_workers=args.workers)
 
         # Determinar archivos a procesar
         if args.files: